@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import json
 import logging
 from pathlib import Path
 from typing import Any
@@ -46,6 +47,31 @@ def config_to_yaml(
     rules: list[dict[str, Any]] | None = None,
 ) -> str:
     """Convert a guardrails config into an agent-policy YAML string."""
+    doc = _config_to_doc(
+        hitl_enabled=hitl_enabled,
+        default_action=default_action,
+        default_channel=default_channel,
+        context_defaults=context_defaults,
+        tool_policies=tool_policies,
+        model_columns=model_columns,
+        model_policies=model_policies,
+        rules=rules,
+    )
+    return yaml.dump(doc, default_flow_style=False, sort_keys=False, allow_unicode=True)
+
+
+def _config_to_doc(
+    *,
+    hitl_enabled: bool,
+    default_action: str,
+    default_channel: str,
+    context_defaults: dict[str, str],
+    tool_policies: dict[str, dict[str, str]],
+    model_columns: list[str],
+    model_policies: dict[str, dict[str, dict[str, str]]],
+    rules: list[dict[str, Any]] | None = None,
+) -> dict[str, Any]:
+    """Build the agent-policy document (as plain dicts) for a guardrails config."""
     # ── Short-circuit: guardrails disabled → everything allowed ──
     if not hitl_enabled:
         doc: dict[str, Any] = {
@@ -58,7 +84,7 @@ def config_to_yaml(
             "defaults": {"effect": "allow", "channel": default_channel},
             "policies": [],
         }
-        return yaml.dump(doc, default_flow_style=False, sort_keys=False, allow_unicode=True)
+        return doc
 
     policies: list[dict[str, Any]] = []
     priority_counter = _PRIORITY_MODEL_TOOL
@@ -158,7 +184,7 @@ def config_to_yaml(
         "context_fallbacks": context_fallbacks,
         "policies": policies,
     }
-    return yaml.dump(doc, default_flow_style=False, sort_keys=False, allow_unicode=True)
+    return doc
 
 
 def yaml_to_config(yaml_text: str) -> dict[str, Any]:
@@ -247,6 +273,16 @@ def build_engine(yaml_text: str) -> PolicyEngine:
     return PolicyEngine(ps)
 
 
+def build_engine_from_config(**config: Any) -> PolicyEngine:
+    """Build a PolicyEngine straight from ``config_to_yaml`` keyword arguments.
+
+    Skips the (pure-Python) YAML emitter: the policy document is serialised
+    as JSON, which is a subset of YAML and accepted by the same loader.
+    """
+    ps = load_policy_set_from_str(json.dumps(_config_to_doc(**config)))
+    return PolicyEngine(ps)
+
+
 def make_eval_context(
     tool_name: str,
     mcp_server: str | None = None,
@@ -3,8 +3,10 @@
 from __future__ import annotations
 
 import enum
+import functools
 import os
 import secrets
+from collections.abc import Mapping
 from pathlib import Path
 from typing import ClassVar
 
@@ -34,6 +36,8 @@ class ServerMode(enum.Enum):
 class Settings:
 
     _DATA_DIR_ENV: ClassVar[str] = "POLYCLAW_DATA_DIR"
+    # Lazily derived values; dropped on reload() so they are re-derived.
+    _CACHED_FIELDS: ClassVar[tuple[str, ...]] = ("acs_resource_id", "telegram_whitelist")
 
     def __init__(self) -> None:
         dotenv = os.getenv("DOTENV_PATH")
@@ -48,7 +52,14 @@ class Settings:
         self.reload()
 
     def reload(self) -> None:
-        e = self._read
+        # Parse the .env file once per reload rather than once per key.
+        env_values = self.env.read_all()
+
+        def e(key: str) -> str:
+            return self._read(key, env_values)
+
+        for name in self._CACHED_FIELDS:
+            self.__dict__.pop(name, None)
 
         raw_mode = (
             os.getenv("POLYCLAW_SERVER_MODE")
@@ -83,8 +94,6 @@ class Settings:
         self.azure_openai_realtime_deployment: str = e("AZURE_OPENAI_REALTIME_DEPLOYMENT") or "gpt-realtime-mini"
         self._acs_callback_token = e("ACS_CALLBACK_TOKEN") or secrets.token_urlsafe(32)
 
-        self.acs_resource_id: str = self._derive_acs_resource_id()
-
         self.admin_secret: str = e("ADMIN_SECRET")
 
         self.memory_model: str = e("MEMORY_MODEL") or "gpt-4.1"
@@ -104,11 +113,17 @@ class Settings:
         self.aca_mi_resource_id: str = e("ACA_MI_RESOURCE_ID")
         self.aca_mi_client_id: str = e("ACA_MI_CLIENT_ID")
 
-        raw_wl = e("TELEGRAM_WHITELIST")
-        self.telegram_whitelist: frozenset[str] = frozenset(
+    @functools.cached_property
+    def telegram_whitelist(self) -> frozenset[str]:
+        raw_wl = self._read("TELEGRAM_WHITELIST")
+        return frozenset(
             uid.strip() for uid in raw_wl.split(",") if uid.strip()
         ) if raw_wl else frozenset()
 
+    @functools.cached_property
+    def acs_resource_id(self) -> str:
+        return self._derive_acs_resource_id()
+
     @property
     def data_dir(self) -> Path:
         return Path(os.getenv(self._DATA_DIR_ENV, str(Path.home() / ".polyclaw")))
@@ -201,8 +216,10 @@ class Settings:
     def acs_callback_token(self) -> str:
         return self._acs_callback_token
 
-    def _read(self, key: str) -> str:
-        raw = self.env.read(key) or os.getenv(key, "")
+    def _read(self, key: str, env_values: Mapping[str, str] | None = None) -> str:
+        if env_values is None:
+            env_values = self.env.read_all()
+        raw = env_values.get(key, "") or os.getenv(key, "")
         if raw and key in SECRET_ENV_KEYS:
             from ..services.keyvault import resolve_if_kv_ref
             return resolve_if_kv_ref(raw)
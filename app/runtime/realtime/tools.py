@@ -144,6 +144,8 @@ ALL_REALTIME_TOOL_SCHEMAS = [
     CHECK_AGENT_TASK_SCHEMA,
 ]
 
+ALL_REALTIME_TOOL_NAMES: frozenset[str] = frozenset(s["name"] for s in ALL_REALTIME_TOOL_SCHEMAS)
+
 
 async def handle_invoke_agent(args: dict[str, Any], agent: Any) -> str:
     prompt = args.get("prompt", "")
@@ -9,16 +9,21 @@ import json
 import logging
 import os
 import shutil
+import stat
+import tempfile
 import time
 import uuid
 import zipfile
+from collections.abc import Iterator
 from pathlib import Path
-from typing import Any
+from typing import IO, Any
 
 import aiohttp
 
 from ..config.settings import cfg
 from ..state.sandbox_config import SandboxConfigStore
+from ..util.async_helpers import run_sync
+from .helpers import _json_loads
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +33,115 @@ MAX_ZIP_SIZE = 100 * 1024 * 1024
 
 _UPLOAD_MAX_RETRIES = 3
 _UPLOAD_BACKOFF_BASE = 1.0
+_COPY_BUFSIZE = 1024 * 1024
+_WRITE_BUFSIZE = 256 * 1024
+
+# Entries this small, or already compressed, gain nothing from deflate.
+_STORED_MAX_SIZE = 4 * 1024
+_STORED_SUFFIXES = frozenset({
+    ".7z", ".bz2", ".gif", ".gz", ".jpeg", ".jpg", ".mp3", ".mp4",
+    ".png", ".webp", ".xz", ".zip", ".zst",
+})
+
+
+# The bootstrap script only varies in the env exports and the command, so
+# the fixed head and tail are assembled once per ``has_data`` variant.
+_UNZIP_DATA = [
+    "if [ -f agent_data.zip ]; then",
+    '  python3 -c "import zipfile; zipfile.ZipFile(\'agent_data.zip\').extractall(\'$HOME\')"',
+    "fi", "",
+]
+_ZIP_RESULT = [
+    "cd $HOME",
+    "python3 -c \""
+    "import zipfile, os, pathlib;"
+    "EXCLUDE={'.cache','.azure','.config','.IdentityService','.net','.npm','.pki'};"
+    "zf=zipfile.ZipFile('/mnt/data/agent_result.zip','w',zipfile.ZIP_DEFLATED);"
+    "[zf.write(os.path.join(r,f),os.path.relpath(os.path.join(r,f))) "
+    "for r,_,fs in os.walk('.') "
+    "if not any(p in EXCLUDE for p in pathlib.PurePath(r).parts) "
+    "for f in fs if not f.endswith('.pyc')];"
+    "zf.close()\"", "",
+]
+
+
+def _bootstrap_head(has_data: bool) -> str:
+    lines = ["#!/bin/bash", "set -e", "", "cd /mnt/data", ""]
+    lines += ["export HOME=/mnt/data/agent_home", "mkdir -p $HOME", ""]
+    if has_data:
+        lines += _UNZIP_DATA
+    lines += [
+        "mkdir -p /mnt/data/polyclaw_src",
+        'python3 -c "import zipfile; zipfile.ZipFile(\'polyclaw_code.zip\').extractall(\'/mnt/data/polyclaw_src\')"',
+        "", "cd /mnt/data/polyclaw_src",
+        "pip install -e . --quiet 2>/dev/null || true",
+        "cd /mnt/data", "",
+        'export POLYCLAW_DATA_DIR="$HOME"',
+    ]
+    return "\n".join(lines)
+
+
+def _bootstrap_tail(has_data: bool) -> str:
+    lines = ["EXIT_CODE=$?", ""]
+    if has_data:
+        lines += _ZIP_RESULT
+    lines += ["exit $EXIT_CODE"]
+    return "\n".join(lines)
+
+
+_BOOTSTRAP_HEAD = {flag: _bootstrap_head(flag) for flag in (False, True)}
+_BOOTSTRAP_TAIL = {flag: _bootstrap_tail(flag) for flag in (False, True)}
+
+
+def _iter_files(root: str) -> Iterator[os.DirEntry[str]]:
+    """Yield the files below *root*, skipping directory symlinks like ``os.walk``.
+
+    ``DirEntry`` carries the file type from the directory listing, so the
+    walk itself needs no extra ``stat`` calls.  Directories that cannot be
+    listed (or vanish mid-walk) are skipped, as ``os.walk`` does by default.
+    """
+    stack = [root]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        stack.append(entry.path)
+                else:
+                    yield entry
+
+
+def _compress_type(name: str, size: int) -> int:
+    """Pick the zip method for an entry: ``ZIP_STORED`` when deflate won't pay."""
+    if size < _STORED_MAX_SIZE or os.path.splitext(name)[1].lower() in _STORED_SUFFIXES:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def _safe_member_name(name: str) -> str | None:
+    """Normalise a zip member name, or return ``None`` if it leaves the root.
+
+    Components are folded on a stack (``.`` and empty parts dropped, ``..``
+    popping one level) so absolute names and any ``..`` that would climb
+    above the extraction root are rejected without touching the filesystem.
+    """
+    if name.startswith("/"):
+        return None
+    parts: list[str] = []
+    for part in name.split("/"):
+        if part in ("", "."):
+            continue
+        if part == "..":
+            if not parts:
+                return None
+            parts.pop()
+        else:
+            parts.append(part)
+    return "/".join(parts) or None
 
 
 class SandboxExecutor:
@@ -45,7 +159,7 @@ class SandboxExecutor:
         if not self._store.sync_data:
             self._pending_data_zip = None
             return
-        self._pending_data_zip = self._create_data_zip()
+        self._pending_data_zip = await run_sync(self._create_data_zip)
 
     async def post_sync(self) -> int:
         self._pending_data_zip = None
@@ -58,7 +172,7 @@ class SandboxExecutor:
         env_vars: dict[str, str] | None = None,
         timeout: int = 300,
     ) -> dict[str, Any]:
-        start = time.time()
+        start = time.monotonic_ns()
         session_id = str(uuid.uuid4())
 
         try:
@@ -73,11 +187,11 @@ class SandboxExecutor:
         async with aiohttp.ClientSession() as http:
             headers = {"Authorization": f"Bearer {token}"}
 
-            data_zip = self._create_data_zip() if self._store.sync_data else None
-            try:
-                code_zip = self._create_code_zip()
-            except Exception as exc:
-                return self._result(False, f"Failed to create code archive: {exc}", start, session_id)
+            data_zip, code_zip = await self._build_archives()
+            if isinstance(code_zip, Exception):
+                return self._result(
+                    False, f"Failed to create code archive: {code_zip}", start, session_id,
+                )
 
             if data_zip:
                 err = await self._upload_bytes(http, endpoint, session_id, "agent_data.zip", data_zip, headers)
@@ -100,9 +214,7 @@ class SandboxExecutor:
             files_synced = 0
             if self._store.sync_data:
                 try:
-                    result_zip = await self._download_file(http, endpoint, session_id, "agent_result.zip", headers)
-                    if result_zip:
-                        files_synced = self._merge_result_zip(result_zip)
+                    files_synced = await self._sync_result_zip(http, endpoint, session_id, headers)
                 except Exception as exc:
                     logger.warning("Failed to merge sandbox results: %s", exc)
 
@@ -114,30 +226,57 @@ class SandboxExecutor:
                 **self._timing(start, session_id),
             }
 
+    async def _build_archives(self) -> tuple[bytes | None, bytes | Exception]:
+        """Build the data and code archives concurrently off the event loop.
+
+        zlib releases the GIL while compressing, so the two archives build in
+        parallel on the default executor.  Data-archive errors propagate; a
+        code-archive failure is returned so callers can report it.
+        """
+        async def _data() -> bytes | None:
+            return await run_sync(self._create_data_zip) if self._store.sync_data else None
+
+        data_zip, code_zip = await asyncio.gather(
+            _data(), run_sync(self._create_code_zip), return_exceptions=True,
+        )
+        if isinstance(data_zip, BaseException):
+            raise data_zip
+        if isinstance(code_zip, BaseException) and not isinstance(code_zip, Exception):
+            raise code_zip
+        return data_zip, code_zip
+
     def _create_data_zip(self) -> bytes | None:
-        data_dir = cfg.data_dir
+        data_dir = str(cfg.data_dir)
+        prefix_len = len(data_dir) + len(os.sep)
         whitelist = self._store.whitelist
+        # A fresh buffer per call is deliberate: getvalue() hands the buffer's
+        # storage to the returned bytes without copying, so a pooled buffer
+        # would be copied on its next write and would pin up to MAX_ZIP_SIZE
+        # per worker thread.
         buf = io.BytesIO()
         count = 0
         with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
             for item_name in whitelist:
-                item_path = data_dir / item_name
-                if not item_path.exists():
+                item_path = os.path.join(data_dir, item_name)
+                try:
+                    st = os.stat(item_path)
+                except OSError:
                     continue
-                if item_path.is_file():
-                    if buf.tell() + item_path.stat().st_size > MAX_ZIP_SIZE:
+                if stat.S_ISREG(st.st_mode):
+                    if buf.tell() + st.st_size > MAX_ZIP_SIZE:
                         continue
-                    zf.write(item_path, item_name)
+                    zf.write(item_path, item_name, _compress_type(item_name, st.st_size))
                     count += 1
-                elif item_path.is_dir():
-                    for root, _dirs, files in os.walk(item_path):
-                        for fname in files:
-                            fpath = Path(root) / fname
-                            arcname = str(fpath.relative_to(data_dir))
-                            if buf.tell() + fpath.stat().st_size > MAX_ZIP_SIZE:
-                                continue
-                            zf.write(fpath, arcname)
-                            count += 1
+                elif stat.S_ISDIR(st.st_mode):
+                    for entry in _iter_files(item_path):
+                        size = entry.stat().st_size
+                        if buf.tell() + size > MAX_ZIP_SIZE:
+                            continue
+                        zf.write(
+                            entry.path, entry.path[prefix_len:],
+                            _compress_type(entry.name, size),
+                        )
+                        count += 1
         return buf.getvalue() if count else None
 
     def _create_code_zip(self) -> bytes:
@@ -175,22 +314,28 @@ class SandboxExecutor:
                         zf.write(fpath, str(fpath.relative_to(project_root)))
         return buf.getvalue()
 
-    def _merge_result_zip(self, zip_data: bytes) -> int:
+    def _merge_result_zip(self, source: bytes | Path | IO[bytes]) -> int:
+        """Extract whitelisted entries of a result archive into the data dir.
+
+        *source* may be the archive bytes, a path, or a seekable binary
+        stream; entries are copied in chunks so only one buffer is held.
+        """
         data_dir = cfg.data_dir
         whitelist = set(self._store.whitelist)
         count = 0
-        with zipfile.ZipFile(io.BytesIO(zip_data), "r") as zf:
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        with zipfile.ZipFile(source, "r") as zf:
             for info in zf.infolist():
                 if info.is_dir():
                     continue
-                name = info.filename
-                top_level = name.split("/")[0]
-                if top_level not in whitelist or ".." in name or name.startswith("/"):
+                name = _safe_member_name(info.filename)
+                if name is None or name.split("/", 1)[0] not in whitelist:
                     continue
                 dest = data_dir / name
                 dest.parent.mkdir(parents=True, exist_ok=True)
-                with zf.open(info) as src, open(dest, "wb") as dst:
-                    shutil.copyfileobj(src, dst)
+                with zf.open(info) as src, open(dest, "wb", buffering=_WRITE_BUFSIZE) as dst:
+                    shutil.copyfileobj(src, dst, _COPY_BUFSIZE)
                 count += 1
         return count
 
@@ -201,40 +346,11 @@ class SandboxExecutor:
         has_data: bool,
         env_vars: dict[str, str] | None = None,
     ) -> str:
-        lines = ["#!/bin/bash", "set -e", "", "cd /mnt/data", ""]
-        lines += ["export HOME=/mnt/data/agent_home", "mkdir -p $HOME", ""]
-        if has_data:
-            lines += [
-                "if [ -f agent_data.zip ]; then",
-                '  python3 -c "import zipfile; zipfile.ZipFile(\'agent_data.zip\').extractall(\'$HOME\')"',
-                "fi", "",
-            ]
-        lines += [
-            "mkdir -p /mnt/data/polyclaw_src",
-            'python3 -c "import zipfile; zipfile.ZipFile(\'polyclaw_code.zip\').extractall(\'/mnt/data/polyclaw_src\')"',
-            "", "cd /mnt/data/polyclaw_src",
-            "pip install -e . --quiet 2>/dev/null || true",
-            "cd /mnt/data", "",
-            'export POLYCLAW_DATA_DIR="$HOME"',
-        ]
+        lines = [_BOOTSTRAP_HEAD[has_data]]
         if env_vars:
             for k, v in env_vars.items():
                 lines.append(f"export {k}='{v.replace(chr(39), chr(39) + chr(92) + chr(39) + chr(39))}'")
-        lines += ["", command, "EXIT_CODE=$?", ""]
-        if has_data:
-            lines += [
-                "cd $HOME",
-                "python3 -c \""
-                "import zipfile, os, pathlib;"
-                "EXCLUDE={'.cache','.azure','.config','.IdentityService','.net','.npm','.pki'};"
-                "zf=zipfile.ZipFile('/mnt/data/agent_result.zip','w',zipfile.ZIP_DEFLATED);"
-                "[zf.write(os.path.join(r,f),os.path.relpath(os.path.join(r,f))) "
-                "for r,_,fs in os.walk('.') "
-                "if not any(p in EXCLUDE for p in pathlib.PurePath(r).parts) "
-                "for f in fs if not f.endswith('.pyc')];"
-                "zf.close()\"", "",
-            ]
-        lines += ["exit $EXIT_CODE"]
+        lines += ["", command, _BOOTSTRAP_TAIL[has_data]]
         return "\n".join(lines)
 
     async def _get_token(self) -> str:
@@ -268,8 +384,11 @@ class SandboxExecutor:
         last_error = ""
         for attempt in range(_UPLOAD_MAX_RETRIES):
             form = aiohttp.FormData()
+            # A BytesIO view (no copy) makes aiohttp stream the body in chunks
+            # instead of writing multi-MB archives to the socket in one call.
             form.add_field(
-                "file", data, filename=filename, content_type="application/octet-stream",
+                "file", io.BytesIO(data), filename=filename,
+                content_type="application/octet-stream",
             )
             try:
                 async with http.post(
@@ -313,7 +432,7 @@ class SandboxExecutor:
         return await self._run_code(http, endpoint, session_id, code, headers, timeout)
 
     async def provision_session(self, session_id: str) -> dict[str, Any]:
-        start = time.time()
+        start = time.monotonic_ns()
         try:
             token = await self._get_token()
         except Exception as exc:
@@ -326,7 +445,7 @@ class SandboxExecutor:
         async with aiohttp.ClientSession() as http:
             headers = {"Authorization": f"Bearer {token}"}
 
-            data_zip = self._create_data_zip() if self._store.sync_data else None
+            data_zip, code_zip = await self._build_archives()
             has_data = False
             if data_zip:
                 err = await self._upload_bytes(http, endpoint, session_id, "agent_data.zip", data_zip, headers)
@@ -338,10 +457,8 @@ class SandboxExecutor:
                 else:
                     has_data = True
 
-            try:
-                code_zip = self._create_code_zip()
-            except Exception as exc:
-                return self._result(False, f"Code archive failed: {exc}", start, session_id)
+            if isinstance(code_zip, Exception):
+                return self._result(False, f"Code archive failed: {code_zip}", start, session_id)
             err = await self._upload_bytes(http, endpoint, session_id, "polyclaw_code.zip", code_zip, headers)
             if err:
                 return self._result(False, f"Code upload failed: {err}", start, session_id)
@@ -358,7 +475,7 @@ class SandboxExecutor:
             return {"success": True, **self._timing(start, session_id)}
 
     async def run_in_session(self, session_id: str, command: str, *, timeout: int = 120) -> dict[str, Any]:
-        start = time.time()
+        start = time.monotonic_ns()
         try:
             token = await self._get_token()
         except Exception as exc:
@@ -417,7 +534,7 @@ class SandboxExecutor:
     ) -> dict[str, Any]:
         """Parse JSON-wrapped subprocess output into a result dict."""
         try:
-            output = json.loads(raw_stdout.strip())
+            output = _json_loads(raw_stdout.strip())
             stdout = output.get("stdout", "")
             stderr = output.get("stderr", "")
             rc = output.get("rc", 0)
@@ -440,26 +557,50 @@ class SandboxExecutor:
                 if endpoint:
                     async with aiohttp.ClientSession() as http:
                         headers = {"Authorization": f"Bearer {token}"}
-                        zip_data = await self._download_file(http, endpoint, session_id, "agent_result.zip", headers)
-                        if zip_data:
-                            self._merge_result_zip(zip_data)
+                        await self._sync_result_zip(http, endpoint, session_id, headers)
             except Exception as exc:
                 logger.warning("Session teardown sync failed: %s", exc)
 
+    async def _sync_result_zip(
+        self, http: aiohttp.ClientSession, endpoint: str, session_id: str,
+        headers: dict[str, str],
+    ) -> int:
+        """Download ``agent_result.zip`` to a temp file and merge it back."""
+        with tempfile.TemporaryDirectory(prefix="polyclaw-sandbox-") as tmp:
+            dest = Path(tmp) / "agent_result.zip"
+            ok = await self._download_file(
+                http, endpoint, session_id, "agent_result.zip", headers, dest,
+            )
+            if not ok:
+                return 0
+            return await run_sync(self._merge_result_zip, dest)
+
     async def _download_file(
         self, http: aiohttp.ClientSession, endpoint: str, session_id: str,
-        filename: str, headers: dict[str, str],
-    ) -> bytes | None:
+        filename: str, headers: dict[str, str], dest: Path,
+    ) -> bool:
+        """Stream a session file to *dest*. Returns ``True`` on success."""
         url = f"{endpoint}/files/content/{filename}?api-version={API_VERSION}&identifier={session_id}"
         try:
             async with http.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=120)) as resp:
-                return await resp.read() if resp.status == 200 else None
+                if resp.status != 200:
+                    return False
+                fh = await run_sync(open, dest, "wb")
+                try:
+                    async for chunk in resp.content.iter_chunked(_COPY_BUFSIZE):
+                        await run_sync(fh.write, chunk)
+                finally:
+                    await run_sync(fh.close)
+                return True
         except Exception as exc:
             logger.warning("Download %s failed: %s", filename, exc)
-            return None
+            return False
 
-    def _timing(self, start: float, session_id: str) -> dict[str, Any]:
-        return {"duration_ms": round((time.time() - start) * 1000), "session_id": session_id}
+    def _timing(self, start_ns: int, session_id: str) -> dict[str, Any]:
+        return {
+            "duration_ms": (time.monotonic_ns() - start_ns) // 1_000_000,
+            "session_id": session_id,
+        }
 
-    def _result(self, success: bool, error: str, start: float, session_id: str) -> dict[str, Any]:
+    def _result(self, success: bool, error: str, start: int, session_id: str) -> dict[str, Any]:
         return {"success": success, "error": error, **self._timing(start, session_id)}
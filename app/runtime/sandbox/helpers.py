@@ -2,19 +2,34 @@
 
 from __future__ import annotations
 
+import functools
 import json
-import shlex
+import re
 from typing import Any
 
+try:
+    # Optional fast path; orjson.JSONDecodeError subclasses
+    # json.JSONDecodeError, so callers keep catching the stdlib type.
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
 _SHELL_TOOL_PATTERNS = ("terminal", "shell", "bash", "command")
+_SHELL_TOOL_RE = re.compile("|".join(_SHELL_TOOL_PATTERNS), re.IGNORECASE)
+_COMMAND_KEYS = ("command", "cmd", "input", "script")
+
+
+def _looks_like_object(text: str) -> bool:
+    """Cheap pre-check so plain command strings skip the JSON parser entirely."""
+    return text.lstrip()[:1] == "{"
 
 
 def _parse_tool_args(raw: Any) -> dict:
     if isinstance(raw, dict):
         return raw
-    if isinstance(raw, str):
+    if isinstance(raw, str) and _looks_like_object(raw):
         try:
-            parsed = json.loads(raw)
+            parsed = _json_loads(raw)
             if isinstance(parsed, dict):
                 return parsed
         except (json.JSONDecodeError, TypeError):
@@ -24,8 +39,10 @@ def _parse_tool_args(raw: Any) -> dict:
 
 def _extract_command(args: Any) -> str:
     if isinstance(args, str):
+        if not _looks_like_object(args):
+            return args
         try:
-            parsed = json.loads(args)
+            parsed = _json_loads(args)
             if isinstance(parsed, dict):
                 args = parsed
             else:
@@ -33,21 +50,33 @@ def _extract_command(args: Any) -> str:
         except (json.JSONDecodeError, TypeError):
             return args
     if isinstance(args, dict):
-        return args.get("command", "") or args.get("cmd", "") or args.get("input", "") or args.get("script", "")
+        for key in _COMMAND_KEYS:
+            value = args.get(key)
+            if value:
+                return value
     return ""
 
 
+@functools.lru_cache(maxsize=512)
 def _is_shell_tool(name: str) -> bool:
-    lower = name.lower()
-    return any(p in lower for p in _SHELL_TOOL_PATTERNS)
+    return _SHELL_TOOL_RE.search(name) is not None
+
+
+def _sh_quote(text: str) -> str:
+    """Single-quote *text* for POSIX shells.
+
+    Unlike ``shlex.quote`` this always quotes, skipping the safe-character
+    regex scan that walks the whole string for long single-token output.
+    """
+    return "'" + text.replace("'", "'\\''") + "'"
 
 
 def _build_replay_command(stdout: str, stderr: str, success: bool) -> str:
     parts: list[str] = []
     if stdout:
-        parts.append(f"printf %s {shlex.quote(stdout)}")
+        parts.append(f"printf %s {_sh_quote(stdout)}")
     if stderr:
-        parts.append(f"printf %s {shlex.quote(stderr)} >&2")
+        parts.append(f"printf %s {_sh_quote(stderr)} >&2")
     if not success:
         parts.append("exit 1")
     return " ; ".join(parts) if parts else "true"
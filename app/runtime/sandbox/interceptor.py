@@ -17,6 +17,17 @@ _SESSION_IDLE_TIMEOUT = 60
 
 
 class SandboxToolInterceptor:
+    # One interceptor lives for each agent session.
+    __slots__ = (
+        "_executor",
+        "_session_id",
+        "_session_ready",
+        "_provisioning",
+        "_last_activity",
+        "_idle_task",
+        "_pending_result",
+    )
+
     def __init__(self, executor: SandboxExecutor) -> None:
         self._executor = executor
         self._session_id: str | None = None
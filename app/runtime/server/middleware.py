@@ -3,7 +3,9 @@
 from __future__ import annotations
 
 import hmac
+import json
 import logging
+from collections.abc import Callable
 
 from aiohttp import web
 from aiohttp.abc import AbstractAccessLogger
@@ -43,14 +45,40 @@ _PUBLIC_PREFIXES = (
     "/api/voice/acs-callback",
     "/api/voice/media-streaming",
 )
-_PUBLIC_EXACT = ("/api/auth/check",)
+_PUBLIC_EXACT = frozenset({"/api/auth/check"})
 
 # Tunnel restrictions and lockdown share the same base set as public prefixes;
-# lockdown adds one extra path.
+# lockdown adds one extra path.  Prefixes stay tuples so a single
+# ``str.startswith(prefixes)`` call checks them all.
 _TUNNEL_ALLOWED_PREFIXES = _PUBLIC_PREFIXES
 _LOCKDOWN_ALLOWED_PREFIXES = _PUBLIC_PREFIXES + ("/api/setup/lockdown",)
 
-_CF_HEADERS = ("cf-connecting-ip", "cf-ray", "cf-ipcountry")
+# Looked up with ``headers.get``, which is case-insensitive on every
+# multidict version (keys-view set operations only are on recent ones).
+# A header that is present but empty does not count as a tunnel.
+_CF_HEADERS = frozenset({"cf-connecting-ip", "cf-ray", "cf-ipcountry"})
+
+# Rejection bodies never change, so they are encoded once; the bytes match
+# what ``web.json_response`` would produce for the same payload.
+_FORBIDDEN_BODY = json.dumps({"status": "forbidden"}).encode()
+_UNAUTHORIZED_BODY = json.dumps(
+    {"status": "unauthorized", "message": "Invalid or missing admin secret"},
+).encode()
+_LOCKED_BODY = json.dumps(
+    {
+        "status": "locked",
+        "message": (
+            "Lock Down Mode is active. The admin panel is disabled. "
+            "Use /lockdown off via the bot to restore access."
+        ),
+    },
+).encode()
+
+
+def _json_body(body: bytes, status: int) -> web.Response:
+    return web.Response(
+        body=body, status=status, content_type="application/json", charset="utf-8",
+    )
 
 
 @web.middleware
@@ -58,63 +86,76 @@ async def lockdown_middleware(request: web.Request, handler):  # type: ignore[ty
     """Block all admin panel routes when lockdown mode is active."""
     if not cfg.lockdown_mode:
         return await handler(request)
-    if any(request.path.startswith(p) for p in _LOCKDOWN_ALLOWED_PREFIXES):
+    if request.path.startswith(_LOCKDOWN_ALLOWED_PREFIXES):
         return await handler(request)
-    return web.json_response(
-        {
-            "status": "locked",
-            "message": (
-                "Lock Down Mode is active. The admin panel is disabled. "
-                "Use /lockdown off via the bot to restore access."
-            ),
-        },
-        status=403,
-    )
+    return _json_body(_LOCKED_BODY, 403)
 
 
-@web.middleware
-async def tunnel_restriction_middleware(request: web.Request, handler):  # type: ignore[type-arg]
-    """Restrict Cloudflare-tunnelled requests to bot-only endpoints."""
-    if not cfg.tunnel_restricted:
-        return await handler(request)
-    is_tunnel = any(request.headers.get(h) for h in _CF_HEADERS)
-    if not is_tunnel:
-        return await handler(request)
-    if any(request.path.startswith(p) for p in _TUNNEL_ALLOWED_PREFIXES):
-        return await handler(request)
-    return web.json_response({"status": "forbidden"}, status=403)
+def create_tunnel_restriction_middleware(
+    restricted: Callable[[], bool] = lambda: cfg.tunnel_restricted,
+) -> Callable:
+    """Create the tunnel restriction middleware.
 
+    *restricted* is read once per request, so toggling the setting takes
+    effect without rebuilding the app.
+    """
 
-@web.middleware
-async def auth_middleware(request: web.Request, handler):  # type: ignore[type-arg]
-    """Require Bearer token on ``/api/*`` endpoints (except public ones)."""
-    secret = cfg.admin_secret
-    if not secret:
-        return await handler(request)
+    @web.middleware
+    async def tunnel_restriction_middleware(request: web.Request, handler):  # type: ignore[type-arg]
+        """Restrict Cloudflare-tunnelled requests to bot-only endpoints."""
+        if not restricted():
+            return await handler(request)
+        is_tunnel = any(request.headers.get(h) for h in _CF_HEADERS)
+        if not is_tunnel:
+            return await handler(request)
+        if request.path.startswith(_TUNNEL_ALLOWED_PREFIXES):
+            return await handler(request)
+        return _json_body(_FORBIDDEN_BODY, 403)
 
-    path = request.path
+    return tunnel_restriction_middleware
 
-    # Only protect /api/* endpoints (except public ones); frontend assets are public
-    if not path.startswith("/api/"):
-        return await handler(request)
 
-    if path in _PUBLIC_EXACT or any(path.startswith(p) for p in _PUBLIC_PREFIXES):
-        return await handler(request)
+def create_auth_middleware(
+    admin_secret: Callable[[], str] = lambda: cfg.admin_secret,
+) -> Callable:
+    """Create the admin-secret auth middleware.
 
-    auth = request.headers.get("Authorization", "")
-    expected = f"Bearer {secret}"
-    if hmac.compare_digest(auth, expected):
-        return await handler(request)
+    *admin_secret* is read once per request; an empty secret disables auth.
+    """
 
-    token_param = request.query.get("token", "")
-    if token_param and hmac.compare_digest(token_param, secret):
-        return await handler(request)
+    @web.middleware
+    async def auth_middleware(request: web.Request, handler):  # type: ignore[type-arg]
+        """Require Bearer token on ``/api/*`` endpoints (except public ones)."""
+        secret = admin_secret()
+        if not secret:
+            return await handler(request)
 
-    secret_param = request.query.get("secret", "")
-    if secret_param and hmac.compare_digest(secret_param, secret):
-        return await handler(request)
+        path = request.path
 
-    return web.json_response(
-        {"status": "unauthorized", "message": "Invalid or missing admin secret"},
-        status=401,
-    )
+        # Only protect /api/* endpoints (except public ones); frontend assets are public
+        if not path.startswith("/api/"):
+            return await handler(request)
+
+        if path in _PUBLIC_EXACT or path.startswith(_PUBLIC_PREFIXES):
+            return await handler(request)
+
+        auth = request.headers.get("Authorization", "")
+        expected = f"Bearer {secret}"
+        if hmac.compare_digest(auth, expected):
+            return await handler(request)
+
+        token_param = request.query.get("token", "")
+        if token_param and hmac.compare_digest(token_param, secret):
+            return await handler(request)
+
+        secret_param = request.query.get("secret", "")
+        if secret_param and hmac.compare_digest(secret_param, secret):
+            return await handler(request)
+
+        return _json_body(_UNAUTHORIZED_BODY, 401)
+
+    return auth_middleware
+
+
+tunnel_restriction_middleware = create_tunnel_restriction_middleware()
+auth_middleware = create_auth_middleware()
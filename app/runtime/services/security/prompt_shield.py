@@ -17,6 +17,7 @@ import logging
 import time
 import urllib.error
 import urllib.request
+from collections.abc import Callable
 from dataclasses import dataclass
 
 logger = logging.getLogger(__name__)
@@ -175,7 +176,8 @@ class PromptShieldService:
 class _BearerTokenProvider:
     """Lazily acquire and cache bearer tokens via ``DefaultAzureCredential``."""
 
-    def __init__(self) -> None:
+    def __init__(self, clock: Callable[[], float] = time.time) -> None:
+        self._clock = clock
         self._credential: object | None = None
         self._cached_token: str = ""
         self._expires_on: float = 0.0
@@ -183,7 +185,7 @@ class _BearerTokenProvider:
     def get_token(self) -> str:
         """Return a valid bearer token, refreshing if necessary."""
         # Return cached token if still valid (with 5-min buffer)
-        if self._cached_token and time.time() < self._expires_on - 300:
+        if self._cached_token and self._clock() < self._expires_on - 300:
             return self._cached_token
 
         if self._credential is None:
@@ -199,7 +201,7 @@ class _BearerTokenProvider:
             self._cached_token = token.token
             self._expires_on = token.expires_on
             logger.info("[prompt_shield.token] acquired bearer token (expires in %.0fs)",
-                        self._expires_on - time.time())
+                        self._expires_on - self._clock())
             return self._cached_token
         except Exception as exc:
             logger.error("[prompt_shield.token] failed to acquire token: %s", exc)
@@ -44,6 +44,23 @@ from .risk import (  # noqa: F401
 
 logger = logging.getLogger(__name__)
 
+try:
+    # Optional fast path for the guardrails file, which is rewritten on
+    # every toggle; the stdlib fallback produces the same layout.
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dump_json(data: dict[str, Any]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(data, indent=2) + "\n").encode()
+
+
+def _load_json(raw: bytes) -> Any:
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
 
 class GuardrailsConfigStore:
     """JSON-file-backed guardrails configuration.
@@ -380,7 +397,7 @@ class GuardrailsConfigStore:
             self._rebuild_engine()
             return
         try:
-            raw = json.loads(self._path.read_text())
+            raw = _load_json(self._path.read_bytes())
             self._config = GuardrailsConfig(
                 hitl_enabled=raw.get("enabled", raw.get("hitl_enabled", False)),
                 default_action=raw.get("default_strategy", raw.get("default_action", "allow")),
@@ -476,7 +493,7 @@ class GuardrailsConfigStore:
 
     def _save(self) -> None:
         self._path.parent.mkdir(parents=True, exist_ok=True)
-        self._path.write_text(json.dumps(self.to_dict(), indent=2) + "\n")
+        self._path.write_bytes(_dump_json(self.to_dict()))
         self._rebuild_engine()
 
 
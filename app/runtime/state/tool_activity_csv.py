@@ -63,7 +63,7 @@ def import_from_sessions(store: ToolActivityStore, session_store: object) -> int
 
     existing_ids: set[str] = set()
     with store._lock:  # noqa: SLF001
-        existing_ids = {f"{e.session_id}:{e.call_id}" for e in store._entries}  # noqa: SLF001
+        existing_ids = {f"{e.session_id}:{e.call_id}" for e in store._entries.values()}  # noqa: SLF001
 
     count = 0
     for session_summary in session_store.list_sessions():
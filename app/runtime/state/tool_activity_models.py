@@ -2,12 +2,17 @@
 
 from __future__ import annotations
 
+import re
 from dataclasses import dataclass, field
 
 
-@dataclass
+@dataclass(slots=True)
 class ToolActivityEntry:
-    """A single recorded tool invocation."""
+    """A single recorded tool invocation.
+
+    Slotted: the store keeps every entry in memory, and slots drop the
+    per-instance ``__dict__``.
+    """
 
     id: str = ""
     session_id: str = ""
@@ -71,6 +76,15 @@ _SUSPICIOUS_PATTERNS: list[tuple[str, int, str]] = [
     ("kubectl exec", 55, "Kubernetes pod execution"),
 ]
 
+# Patterns are plain substrings.  One alternation scans the text in a single
+# pass so clean calls (the common case) skip the per-pattern loop; matches
+# can overlap, so a hit still walks every pattern to collect all factors.
+_LOWER_PATTERNS = [
+    (pattern.lower(), pattern, severity, description)
+    for pattern, severity, description in _SUSPICIOUS_PATTERNS
+]
+_SUSPICIOUS_RE = re.compile("|".join(re.escape(p[0]) for p in _LOWER_PATTERNS))
+
 
 def check_suspicious(arguments: str, result: str) -> tuple[bool, str, int, list[str]]:
     """Check if a tool call looks suspicious based on arguments/result.
@@ -78,11 +92,13 @@ def check_suspicious(arguments: str, result: str) -> tuple[bool, str, int, list[
     Returns (flagged, primary_reason, risk_score, risk_factors).
     """
     text = f"{arguments} {result}".lower()
+    if _SUSPICIOUS_RE.search(text) is None:
+        return False, "", 0, []
     factors: list[str] = []
     max_severity = 0
     primary_reason = ""
-    for pattern, severity, description in _SUSPICIOUS_PATTERNS:
-        if pattern.lower() in text:
+    for lowered, pattern, severity, description in _LOWER_PATTERNS:
+        if lowered in text:
             factors.append(description)
             if severity > max_severity:
                 max_severity = severity
@@ -0,0 +1,148 @@
+"""Running aggregates behind the tool activity summary and session views."""
+
+from __future__ import annotations
+
+import bisect
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any
+
+from .tool_activity_models import ToolActivityEntry
+
+
+def _bump(counter: Counter[str], key: str, sign: int) -> None:
+    """Add *sign* to ``counter[key]``, dropping the key when it reaches zero."""
+    count = counter[key] + sign
+    if count:
+        counter[key] = count
+    else:
+        del counter[key]
+
+
+@dataclass
+class _SessionStats:
+    tool_count: int = 0
+    flagged_count: int = 0
+    max_risk: int = 0
+    categories: Counter[str] = field(default_factory=Counter)
+    tools: Counter[str] = field(default_factory=Counter)
+    models: Counter[str] = field(default_factory=Counter)
+    first_ts: float = 0.0
+    last_ts: float = 0.0
+    total_duration_ms: float = 0.0
+
+
+class ActivityStats:
+    """Aggregates over the latest version of every entry, kept up to date.
+
+    Callers ``remove`` an entry before mutating it and ``add`` it back
+    afterwards.  Entries are only ever replaced by a newer version of
+    themselves -- same session and timestamp, risk score never lowered --
+    so the per-session first/last timestamps and maximum risk only need
+    to grow.
+    """
+
+    def __init__(self) -> None:
+        self.total = 0
+        self.flagged = 0
+        self.by_tool: Counter[str] = Counter()
+        self.by_category: Counter[str] = Counter()
+        self.by_status: Counter[str] = Counter()
+        self.by_session: Counter[str] = Counter()
+        self.by_model: Counter[str] = Counter()
+        self.by_interaction_type: Counter[str] = Counter()
+        self.durations: list[float] = []  # kept sorted
+        self.duration_sum = 0.0
+        self.risk_high = 0
+        self.risk_medium = 0
+        self.risk_low = 0
+        self.sessions: dict[str, _SessionStats] = {}
+
+    def add(self, entry: ToolActivityEntry) -> None:
+        self._apply(entry, 1)
+
+    def remove(self, entry: ToolActivityEntry) -> None:
+        self._apply(entry, -1)
+
+    def _apply(self, e: ToolActivityEntry, sign: int) -> None:
+        self.total += sign
+        if e.flagged:
+            self.flagged += sign
+        _bump(self.by_tool, e.tool, sign)
+        _bump(self.by_category, e.category, sign)
+        _bump(self.by_status, e.status, sign)
+        _bump(self.by_session, e.session_id, sign)
+        if e.model:
+            _bump(self.by_model, e.model, sign)
+        if e.interaction_type:
+            _bump(self.by_interaction_type, e.interaction_type, sign)
+        if e.duration_ms is not None:
+            if sign > 0:
+                bisect.insort(self.durations, e.duration_ms)
+            else:
+                del self.durations[bisect.bisect_left(self.durations, e.duration_ms)]
+            self.duration_sum += sign * e.duration_ms
+        if e.risk_score >= 70:
+            self.risk_high += sign
+        elif e.risk_score >= 40:
+            self.risk_medium += sign
+        elif e.risk_score > 0:
+            self.risk_low += sign
+
+        s = self.sessions.get(e.session_id)
+        if s is None:
+            s = self.sessions[e.session_id] = _SessionStats(
+                first_ts=e.timestamp, last_ts=e.timestamp,
+            )
+        s.tool_count += sign
+        if e.flagged:
+            s.flagged_count += sign
+        _bump(s.categories, e.category, sign)
+        _bump(s.tools, e.tool, sign)
+        if e.model:
+            _bump(s.models, e.model, sign)
+        if e.duration_ms:
+            s.total_duration_ms += sign * e.duration_ms
+        if sign > 0:
+            s.max_risk = max(s.max_risk, e.risk_score)
+            s.first_ts = min(s.first_ts, e.timestamp)
+            s.last_ts = max(s.last_ts, e.timestamp)
+
+    def summary(self) -> dict[str, Any]:
+        durations = self.durations
+        n = len(durations)
+        return {
+            "total": self.total,
+            "flagged": self.flagged,
+            "by_tool": dict(self.by_tool.most_common(20)),
+            "by_category": dict(self.by_category),
+            "by_status": dict(self.by_status),
+            "by_model": dict(self.by_model),
+            "by_interaction_type": dict(self.by_interaction_type),
+            "sessions_with_activity": len(self.by_session),
+            "avg_duration_ms": round(self.duration_sum / n, 1) if n else 0,
+            "max_duration_ms": round(durations[-1], 1) if n else 0,
+            "p95_duration_ms": round(durations[int(n * 0.95)], 1) if n else 0,
+            "risk_high": self.risk_high,
+            "risk_medium": self.risk_medium,
+            "risk_low": self.risk_low,
+        }
+
+    def session_breakdown(self) -> list[dict[str, Any]]:
+        result = [
+            {
+                "session_id": sid,
+                "tool_count": s.tool_count,
+                "flagged_count": s.flagged_count,
+                "max_risk": s.max_risk,
+                "categories": sorted(s.categories),
+                "unique_tools": len(s.tools),
+                "models": sorted(s.models),
+                "first_activity": s.first_ts,
+                "last_activity": s.last_ts,
+                "total_duration_ms": round(s.total_duration_ms, 1),
+            }
+            for sid, s in self.sessions.items() if s.tool_count
+        ]
+        result.sort(key=lambda x: x["last_activity"], reverse=True)
+        return result
@@ -2,20 +2,185 @@
 
 from __future__ import annotations
 
+import atexit
+import dataclasses
+import functools
 import json
 import logging
+import mmap
+import os
+import shutil
 import threading
 import time
-from dataclasses import asdict
+import weakref
+from collections.abc import Iterator
+from dataclasses import fields
 from pathlib import Path
 from typing import Any
 
 from ..config.settings import cfg
 from ..util.singletons import Singleton
 from .tool_activity_models import ToolActivityEntry, check_suspicious
+from .tool_activity_stats import ActivityStats
 
 logger = logging.getLogger(__name__)
 
+try:
+    # Optional fast path: orjson encodes the entry dataclasses natively and
+    # emits bytes, skipping the dict copy and the str encode.
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_ENTRY_FIELDS = tuple(f.name for f in fields(ToolActivityEntry))
+_ENTRY_FIELD_SET = frozenset(_ENTRY_FIELDS)
+
+
+def _entry_dict(entry: ToolActivityEntry) -> dict[str, Any]:
+    """Equivalent of ``dataclasses.asdict`` for an entry, without its deep copy.
+
+    Every field is immutable except ``risk_factors``, which is copied.
+    """
+    data = {name: getattr(entry, name) for name in _ENTRY_FIELDS}
+    data["risk_factors"] = list(entry.risk_factors)
+    return data
+
+
+def _entry_from(data: dict[str, Any]) -> ToolActivityEntry:
+    """Build an entry from a decoded log line, ignoring unknown keys."""
+    if _ENTRY_FIELD_SET.issuperset(data):
+        return ToolActivityEntry(**data)
+    return ToolActivityEntry(**{k: v for k, v in data.items() if k in _ENTRY_FIELD_SET})
+
+
+def _encode(obj: Any) -> bytes:
+    """Serialise an entry or patch record as one JSON line."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=str, option=orjson.OPT_APPEND_NEWLINE)
+        except TypeError:
+            # orjson rejects lone surrogates; the stdlib escapes them.
+            pass
+    if isinstance(obj, ToolActivityEntry):
+        obj = _entry_dict(obj)
+    return (json.dumps(obj, default=str) + "\n").encode()
+
+
+def _decode(line: bytes) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(line)
+        except orjson.JSONDecodeError:
+            # Escaped lone surrogates written by the stdlib fallback in
+            # ``_encode`` only decode with the stdlib parser.
+            pass
+    return json.loads(line)
+
+
+_MMAP_MIN_SIZE = 1 << 16
+
+
+def _read_lines(path: Path) -> Iterator[bytes]:
+    """Yield the raw lines of *path*.
+
+    Large logs are memory-mapped and walked line by line, so the file is
+    paged in lazily instead of being copied into one buffer and split.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < _MMAP_MIN_SIZE:
+            yield from f.read().split(b"\n")
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from iter(mm.readline, b"")
+
+
+# Flag changes are appended as small ``{"op": ...}`` patch records; once they
+# outnumber this share of the entries the file is rewritten without them.
+_COMPACT_RATIO = 0.25
+_COMPACT_MIN_PATCHES = 64
+
+# Log lines are coalesced and written once BATCH_SIZE are pending or
+# BATCH_MS after the first one, whichever comes first.
+_BATCH_SIZE = int(os.getenv("POLYCLAW_ACTIVITY_BATCH_SIZE", "32"))
+_BATCH_MS = int(os.getenv("POLYCLAW_ACTIVITY_BATCH_MS", "50"))
+
+# Each store has one daemon flusher thread, started on first write. It
+# exits after this long without new lines and is restarted on demand.
+_FLUSHER_IDLE_S = 5.0
+
+_live_stores: weakref.WeakSet[ToolActivityStore] = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_live_stores() -> None:
+    for store in list(_live_stores):
+        store.flush()
+
+
+def _flush_loop(store_ref: weakref.ref[ToolActivityStore], wake: threading.Event) -> None:
+    """Flush a store BATCH_MS after *wake* signals a new batch.
+
+    Only a weak reference is held between batches, so the thread never keeps
+    its store alive; it exits once the store is collected or stays idle.
+    """
+    while True:
+        if wake.wait(_FLUSHER_IDLE_S):
+            wake.clear()
+            time.sleep(_BATCH_MS / 1000)
+            store = store_ref()
+            if store is None:
+                return
+            store.flush()
+            del store
+            continue
+        store = store_ref()
+        if store is None:
+            return
+        with store._lock:  # noqa: SLF001
+            # A batch may have started while the wait timed out.
+            if not wake.is_set():
+                store._flusher = None  # noqa: SLF001
+                return
+        del store
+
+
+# Exact-match query filters served from secondary indexes (value -> ids).
+# These fields are fixed when an entry is recorded.
+_INDEXED_FIELDS = ("session_id", "category", "interaction_type")
+
+
+_SDK_TOOLS = frozenset({"create", "edit", "view", "grep", "glob", "run", "bash"})
+
+
+# The set of tool names seen in practice is small, so the category is
+# memoised per name rather than re-derived on every ``record_start``.
+@functools.lru_cache(maxsize=512)
+def _infer_category(tool: str) -> str:
+    """Infer tool category from the tool name."""
+    if tool.lower() in _SDK_TOOLS:
+        return "sdk"
+    if "__" in tool or "." in tool or tool.startswith("mcp_"):
+        return "mcp"
+    return "custom"
+
+
+def _id_seq(entry: ToolActivityEntry) -> int:
+    return int(entry.id.rsplit("-", 1)[-1] or "0")
+
+
+def _apply_flag(entry: ToolActivityEntry, reason: str) -> None:
+    entry.flagged = True
+    entry.flag_reason = reason or "Manually flagged"
+    entry.risk_score = max(entry.risk_score, 50)
+    if "Manual review" not in entry.risk_factors:
+        entry.risk_factors.append("Manual review")
+
+
+def _apply_unflag(entry: ToolActivityEntry) -> None:
+    entry.flagged = False
+    entry.flag_reason = ""
+
 
 class ToolActivityStore:
     """Append-only log of tool invocations for audit and review.
@@ -28,17 +193,30 @@ class ToolActivityStore:
         self._path = path or cfg.data_dir / "tool_activity.jsonl"
         self._path.parent.mkdir(parents=True, exist_ok=True)
         self._lock = threading.Lock()
-        self._entries: list[ToolActivityEntry] = []
-        self._pending_starts: dict[str, ToolActivityEntry] = {}
+        self._entries: dict[str, ToolActivityEntry] = {}
+        self._indexes: dict[str, dict[str, set[str]]] = {f: {} for f in _INDEXED_FIELDS}
+        self._stats = ActivityStats()
+        # call_id -> (entry, monotonic start in ns); ``timestamp`` stays
+        # wall-clock for display, durations use the monotonic clock.
+        self._pending_starts: dict[str, tuple[ToolActivityEntry, int]] = {}
         self._counter = 0
+        self._patches = 0
+        self._compacting = False
+        self._buf: list[bytes] = []
+        self._wake = threading.Event()
+        self._flusher: threading.Thread | None = None
         self._load()
+        _live_stores.add(self)
+
+    def _snapshot(self) -> list[ToolActivityEntry]:
+        """Return the latest version of every entry.  Caller holds the lock."""
+        return list(self._entries.values())
 
-    def _deduplicated(self) -> list[ToolActivityEntry]:
-        """Return entries deduplicated by id, keeping the latest version."""
-        by_id: dict[str, ToolActivityEntry] = {}
-        for e in self._entries:
-            by_id[e.id] = e
-        return list(by_id.values())
+    def _index(self, entry: ToolActivityEntry) -> None:
+        for field_name, index in self._indexes.items():
+            value = getattr(entry, field_name)
+            if value:
+                index.setdefault(value, set()).add(entry.id)
 
     def _load(self) -> None:
         if not self._path.exists():
@@ -46,18 +224,29 @@ class ToolActivityStore:
         with self._lock:
             try:
                 by_id: dict[str, ToolActivityEntry] = {}
-                for line in self._path.read_text().splitlines():
+                for line in _read_lines(self._path):
                     line = line.strip()
                     if not line:
                         continue
-                    data = json.loads(line)
-                    entry = ToolActivityEntry(**{
-                        k: v for k, v in data.items()
-                        if k in ToolActivityEntry.__dataclass_fields__
-                    })
+                    data = _decode(line)
+                    op = data.get("op")
+                    if op:
+                        self._patches += 1
+                        target = by_id.get(data.get("id", ""))
+                        if target is None:
+                            continue
+                        if op == "flag":
+                            _apply_flag(target, data.get("reason", ""))
+                        elif op == "unflag":
+                            _apply_unflag(target)
+                        continue
+                    entry = _entry_from(data)
                     by_id[entry.id] = entry
-                    self._counter = max(self._counter, int(entry.id.split("-")[-1] or "0"))
-                self._entries = list(by_id.values())
+                self._entries = by_id
+                self._counter = max(self._counter, max(map(_id_seq, by_id.values()), default=0))
+                for entry in by_id.values():
+                    self._index(entry)
+                    self._stats.add(entry)
             except (json.JSONDecodeError, OSError) as exc:
                 logger.warning("[tool_activity] failed to load: %s", exc, exc_info=True)
 
@@ -66,10 +255,44 @@ class ToolActivityStore:
         return f"ta-{self._counter}"
 
     def _append(self, entry: ToolActivityEntry) -> None:
+        line = _encode(entry)
+        with self._lock:
+            self._entries[entry.id] = entry
+            self._index(entry)
+            self._stats.add(entry)
+            self._write_line(line)
+
+    def _write_line(self, line: bytes) -> None:
+        """Queue one log line, writing the batch once it is full.  Caller holds the lock."""
+        self._buf.append(line)
+        if len(self._buf) >= _BATCH_SIZE or _BATCH_MS <= 0:
+            self._flush_locked()
+        elif len(self._buf) == 1:
+            # First line of a new batch: have the flusher write it BATCH_MS from now.
+            self._wake.set()
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=_flush_loop,
+                    args=(weakref.ref(self), self._wake),
+                    name="tool-activity-flush",
+                    daemon=True,
+                )
+                self._flusher.start()
+
+    def flush(self) -> None:
+        """Write any queued log lines to disk."""
         with self._lock:
-            self._entries.append(entry)
-            with open(self._path, "a") as f:
-                f.write(json.dumps(asdict(entry), default=str) + "\n")
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._buf:
+            return
+        try:
+            with open(self._path, "ab") as f:
+                f.write(b"".join(self._buf))
+            self._buf.clear()
+        except OSError as exc:
+            logger.warning("[tool_activity] failed to write log: %s", exc, exc_info=True)
 
     def record_start(
         self,
@@ -87,7 +310,7 @@ class ToolActivityStore:
             session_id=session_id,
             tool=tool,
             call_id=call_id,
-            category=category or self._infer_category(tool),
+            category=category or _infer_category(tool),
             arguments=arguments,
             status="started",
             timestamp=time.time(),
@@ -99,8 +322,9 @@ class ToolActivityStore:
         entry.flag_reason = reason
         entry.risk_score = risk
         entry.risk_factors = factors
-        self._pending_starts[call_id] = entry
+        start_ns = time.monotonic_ns()
         self._append(entry)
+        self._pending_starts[call_id] = (entry, start_ns)
         return entry
 
     def update_shield_result(
@@ -111,8 +335,9 @@ class ToolActivityStore:
         shield_elapsed_ms: float | None = None,
     ) -> None:
         """Attach Content Safety shield results to a pending tool entry."""
-        pending = self._pending_starts.get(call_id)
-        if pending:
+        started = self._pending_starts.get(call_id)
+        if started:
+            pending = started[0]
             pending.shield_result = shield_result
             pending.shield_detail = shield_detail
             pending.shield_elapsed_ms = shield_elapsed_ms
@@ -124,28 +349,32 @@ class ToolActivityStore:
         status: str = "completed",
     ) -> ToolActivityEntry | None:
         """Record the completion of a tool invocation."""
-        pending = self._pending_starts.pop(call_id, None)
-        if not pending:
+        started = self._pending_starts.pop(call_id, None)
+        if not started:
             return None
-        pending.result = result[:2000] if result else ""
-        pending.status = status
-        pending.duration_ms = (time.time() - pending.timestamp) * 1000
+        pending, start_ns = started
+        duration_ms = (time.monotonic_ns() - start_ns) / 1_000_000
         flagged, reason, risk, factors = check_suspicious(pending.arguments, result)
-        if flagged and not pending.flagged:
-            pending.flagged = True
-            pending.flag_reason = reason
-        if risk > pending.risk_score:
-            pending.risk_score = risk
-        pending.risk_factors = list(set(pending.risk_factors + factors))
-        # Replace the in-memory start entry with completed version
+        # Replace the in-memory start entry with completed version.  The
+        # record is encoded before any in-memory state changes.
         with self._lock:
-            for i, e in enumerate(self._entries):
-                if e.id == pending.id:
-                    self._entries[i] = pending
-                    break
-            with open(self._path, "a") as f:
-                f.write(json.dumps(asdict(pending), default=str) + "\n")
-        return pending
+            completed = dataclasses.replace(
+                pending,
+                result=result[:2000] if result else "",
+                status=status,
+                duration_ms=duration_ms,
+                risk_score=max(risk, pending.risk_score),
+                risk_factors=list(set(pending.risk_factors + factors)),
+            )
+            if flagged and not pending.flagged:
+                completed.flagged = True
+                completed.flag_reason = reason
+            line = _encode(completed)
+            self._stats.remove(pending)
+            self._entries[completed.id] = completed
+            self._stats.add(completed)
+            self._write_line(line)
+        return completed
 
     def query(
         self,
@@ -163,17 +392,14 @@ class ToolActivityStore:
     ) -> dict[str, Any]:
         """Query tool activity with filters."""
         with self._lock:
-            entries = sorted(
-                self._deduplicated(), key=lambda e: e.timestamp, reverse=True,
+            entries = self._candidates(
+                session_id=session_id, category=category, interaction_type=interaction_type,
             )
+        entries.sort(key=lambda e: e.timestamp, reverse=True)
 
-        # Apply filters
-        if session_id:
-            entries = [e for e in entries if e.session_id == session_id]
+        # Apply the remaining filters
         if tool:
             entries = [e for e in entries if tool.lower() in e.tool.lower()]
-        if category:
-            entries = [e for e in entries if e.category == category]
         if status:
             entries = [e for e in entries if e.status == status]
         if flagged_only:
@@ -182,105 +408,117 @@ class ToolActivityStore:
             entries = [e for e in entries if e.timestamp >= since]
         if model:
             entries = [e for e in entries if model.lower() in e.model.lower()]
-        if interaction_type:
-            entries = [e for e in entries if e.interaction_type == interaction_type]
 
         total = len(entries)
         page = entries[offset : offset + limit]
 
         return {
-            "entries": [asdict(e) for e in page],
+            "entries": [_entry_dict(e) for e in page],
             "total": total,
             "offset": offset,
             "limit": limit,
         }
 
+    def _candidates(self, **exact: str) -> list[ToolActivityEntry]:
+        """Entries matching the given exact-field filters, in recording order.
+
+        Caller holds the lock.  Without filters this is every entry.
+        """
+        id_sets = [
+            self._indexes[field_name].get(value, set())
+            for field_name, value in exact.items() if value
+        ]
+        if not id_sets:
+            return self._snapshot()
+        ids = set.intersection(*sorted(id_sets, key=len))
+        return sorted((self._entries[i] for i in ids), key=_id_seq)
+
     def get_summary(self) -> dict[str, Any]:
         """Get aggregate statistics about tool activity."""
-        from collections import Counter
-
         with self._lock:
-            entries = self._deduplicated()
-
-        total = len(entries)
-        flagged = sum(1 for e in entries if e.flagged)
-        by_tool: Counter[str] = Counter()
-        by_category: Counter[str] = Counter()
-        by_status: Counter[str] = Counter()
-        by_session: Counter[str] = Counter()
-        by_model: Counter[str] = Counter()
-        by_interaction_type: Counter[str] = Counter()
-        durations: list[float] = []
-        risk_scores: list[int] = []
-        for e in entries:
-            by_tool[e.tool] += 1
-            by_category[e.category] += 1
-            by_status[e.status] += 1
-            by_session[e.session_id] += 1
-            if e.model:
-                by_model[e.model] += 1
-            if e.interaction_type:
-                by_interaction_type[e.interaction_type] += 1
-            if e.duration_ms is not None:
-                durations.append(e.duration_ms)
-            if e.risk_score > 0:
-                risk_scores.append(e.risk_score)
-
-        avg_duration = sum(durations) / len(durations) if durations else 0
-        max_duration = max(durations) if durations else 0
-        p95_duration = sorted(durations)[int(len(durations) * 0.95)] if durations else 0
-
-        return {
-            "total": total,
-            "flagged": flagged,
-            "by_tool": dict(by_tool.most_common(20)),
-            "by_category": dict(by_category),
-            "by_status": dict(by_status),
-            "by_model": dict(by_model),
-            "by_interaction_type": dict(by_interaction_type),
-            "sessions_with_activity": len(by_session),
-            "avg_duration_ms": round(avg_duration, 1),
-            "max_duration_ms": round(max_duration, 1),
-            "p95_duration_ms": round(p95_duration, 1),
-            "risk_high": sum(1 for s in risk_scores if s >= 70),
-            "risk_medium": sum(1 for s in risk_scores if 40 <= s < 70),
-            "risk_low": sum(1 for s in risk_scores if 0 < s < 40),
-        }
+            return self._stats.summary()
 
     def get_entry(self, entry_id: str) -> dict[str, Any] | None:
         """Get a single entry by ID."""
         with self._lock:
-            for e in reversed(self._entries):
-                if e.id == entry_id:
-                    return asdict(e)
-        return None
+            e = self._entries.get(entry_id)
+            return _entry_dict(e) if e is not None else None
 
     def flag_entry(self, entry_id: str, reason: str = "") -> bool:
         """Manually flag an entry as suspicious."""
         with self._lock:
-            for e in self._entries:
-                if e.id == entry_id:
-                    e.flagged = True
-                    e.flag_reason = reason or "Manually flagged"
-                    e.risk_score = max(e.risk_score, 50)
-                    if "Manual review" not in e.risk_factors:
-                        e.risk_factors.append("Manual review")
-                    with open(self._path, "a") as f:
-                        f.write(json.dumps(asdict(e), default=str) + "\n")
-                    return True
-        return False
+            e = self._entries.get(entry_id)
+            if e is None:
+                return False
+            line = _encode({"op": "flag", "id": entry_id, "reason": reason})
+            self._stats.remove(e)
+            _apply_flag(e, reason)
+            self._stats.add(e)
+            compact = self._append_patch(line)
+        if compact:
+            self._compact()
+        return True
 
     def unflag_entry(self, entry_id: str) -> bool:
         """Remove flag from an entry."""
         with self._lock:
-            for e in self._entries:
-                if e.id == entry_id:
-                    e.flagged = False
-                    e.flag_reason = ""
-                    with open(self._path, "a") as f:
-                        f.write(json.dumps(asdict(e), default=str) + "\n")
-                    return True
-        return False
+            e = self._entries.get(entry_id)
+            if e is None:
+                return False
+            line = _encode({"op": "unflag", "id": entry_id})
+            self._stats.remove(e)
+            _apply_unflag(e)
+            self._stats.add(e)
+            compact = self._append_patch(line)
+        if compact:
+            self._compact()
+        return True
+
+    def _append_patch(self, line: bytes) -> bool:
+        """Append a patch line.  Caller holds the lock.
+
+        Returns whether enough patches have piled up to compact the log.
+        """
+        self._write_line(line)
+        self._patches += 1
+        return self._patches > max(_COMPACT_MIN_PATCHES, len(self._entries) * _COMPACT_RATIO)
+
+    def _compact(self) -> None:
+        """Rewrite the log as one line per entry.
+
+        The lock is only held to snapshot the entries and to swap the new
+        file in; lines appended while the snapshot is being written are
+        copied over from the tail of the old file before the swap.
+        """
+        with self._lock:
+            if self._compacting:
+                return
+            self._flush_locked()
+            if self._buf:
+                return  # the log is not writable; retry on a later patch
+            try:
+                offset = self._path.stat().st_size
+            except OSError as exc:
+                logger.warning("[tool_activity] compaction failed: %s", exc, exc_info=True)
+                return
+            entries = self._snapshot()
+            patches = self._patches
+            self._compacting = True
+        tmp = self._path.with_name(self._path.name + ".tmp")
+        try:
+            with open(tmp, "wb") as f:
+                f.write(b"".join(_encode(e) for e in entries))
+            with self._lock:
+                self._flush_locked()
+                with open(self._path, "rb") as src, open(tmp, "ab") as dst:
+                    src.seek(offset)
+                    shutil.copyfileobj(src, dst)
+                os.replace(tmp, self._path)
+                self._patches -= patches
+        except OSError as exc:
+            logger.warning("[tool_activity] compaction failed: %s", exc, exc_info=True)
+        finally:
+            self._compacting = False
 
     def get_timeline(
         self,
@@ -291,7 +529,7 @@ class ToolActivityStore:
     ) -> list[dict[str, Any]]:
         """Return tool call counts bucketed by time interval."""
         with self._lock:
-            entries = self._deduplicated()
+            entries = self._snapshot()
 
         if not entries:
             return []
@@ -327,54 +565,7 @@ class ToolActivityStore:
     def get_session_breakdown(self) -> list[dict[str, Any]]:
         """Return per-session aggregation for the session-level audit view."""
         with self._lock:
-            entries = self._deduplicated()
-
-        sessions: dict[str, dict[str, Any]] = {}
-        for e in entries:
-            sid = e.session_id
-            if sid not in sessions:
-                sessions[sid] = {
-                    "session_id": sid,
-                    "tool_count": 0,
-                    "flagged_count": 0,
-                    "max_risk": 0,
-                    "categories": set(),
-                    "tools_used": set(),
-                    "models_used": set(),
-                    "first_ts": e.timestamp,
-                    "last_ts": e.timestamp,
-                    "total_duration_ms": 0.0,
-                }
-            s = sessions[sid]
-            s["tool_count"] += 1
-            if e.flagged:
-                s["flagged_count"] += 1
-            s["max_risk"] = max(s["max_risk"], e.risk_score)
-            s["categories"].add(e.category)
-            s["tools_used"].add(e.tool)
-            if e.model:
-                s["models_used"].add(e.model)
-            s["first_ts"] = min(s["first_ts"], e.timestamp)
-            s["last_ts"] = max(s["last_ts"], e.timestamp)
-            if e.duration_ms:
-                s["total_duration_ms"] += e.duration_ms
-
-        result = []
-        for s in sessions.values():
-            result.append({
-                "session_id": s["session_id"],
-                "tool_count": s["tool_count"],
-                "flagged_count": s["flagged_count"],
-                "max_risk": s["max_risk"],
-                "categories": sorted(s["categories"]),
-                "unique_tools": len(s["tools_used"]),
-                "models": sorted(s["models_used"]),
-                "first_activity": s["first_ts"],
-                "last_activity": s["last_ts"],
-                "total_duration_ms": round(s["total_duration_ms"], 1),
-            })
-        result.sort(key=lambda x: x["last_activity"], reverse=True)
-        return result
+            return self._stats.session_breakdown()
 
     def export_csv(self, **filters: Any) -> str:
         """Export filtered entries as CSV string."""
@@ -384,12 +575,7 @@ class ToolActivityStore:
     @staticmethod
     def _infer_category(tool: str) -> str:
         """Infer tool category from the tool name."""
-        sdk_tools = {"create", "edit", "view", "grep", "glob", "run", "bash"}
-        if tool.lower() in sdk_tools:
-            return "sdk"
-        if "__" in tool or "." in tool or tool.startswith("mcp_"):
-            return "mcp"
-        return "custom"
+        return _infer_category(tool)
 
     def import_from_sessions(self, session_store: object) -> int:
         """Backfill tool activity from existing session data."""
@@ -7,6 +7,10 @@ from unittest.mock import AsyncMock
 
 import pytest
 
+from app.runtime.config import settings as _settings
+
+_IMPORT_TIME_CFG = _settings.cfg
+
 
 @pytest.fixture(autouse=True)
 def _isolate_data_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, request) -> Path:
@@ -19,6 +23,11 @@ def _isolate_data_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, request)
     monkeypatch.setenv("POLYCLAW_DATA_DIR", str(data_dir))
     monkeypatch.setenv("POLYCLAW_PROJECT_ROOT", str(tmp_path))
     monkeypatch.setenv("DOTENV_PATH", str(tmp_path / ".env"))
+    # Modules that did ``from ...settings import cfg`` keep the instance
+    # built at import time (before DOTENV_PATH was set), so repoint its
+    # env file too -- otherwise cfg.write_env() lands in the working dir.
+    for settings in (_IMPORT_TIME_CFG, _settings.cfg):
+        monkeypatch.setattr(settings.env, "path", tmp_path / ".env")
     yield data_dir
 
 
@@ -2,7 +2,9 @@
 
 from __future__ import annotations
 
+import os
 from pathlib import Path
+from unittest.mock import patch
 
 from app.runtime.util.env_file import EnvFile
 
@@ -34,6 +36,12 @@ class TestEnvFile:
         assert env.read("KEY") == "val"
         assert len(env.read_all()) == 1
 
+    def test_skips_indented_comments_and_bare_lines(self, tmp_path: Path) -> None:
+        p = tmp_path / ".env"
+        p.write_text("  # OLD=1\nNOEQUALS\n\r\n  SPACED = ' x '  \r\nURL=a=b\n")
+        env = EnvFile(p)
+        assert env.read_all() == {"SPACED": " x ", "URL": "a=b"}
+
     def test_handles_quoted_values(self, tmp_path: Path) -> None:
         p = tmp_path / ".env"
         p.write_text('KEY="hello world"\n')
@@ -44,3 +52,48 @@ class TestEnvFile:
         env = EnvFile(tmp_path / "nonexistent.env")
         assert env.read("ANY") == ""
         assert env.read_all() == {}
+
+    def test_reuses_parse_while_unchanged(self, tmp_path: Path) -> None:
+        p = tmp_path / ".env"
+        p.write_text("KEY=val\n")
+        os.utime(p, ns=(1_000_000_000, 1_000_000_000))
+        env = EnvFile(p)
+        with patch.object(Path, "read_text", wraps=p.read_text) as read_text:
+            assert env.read("KEY") == "val"
+            assert env.read("KEY") == "val"
+            assert env.read_all() == {"KEY": "val"}
+        assert read_text.call_count == 1
+
+    def test_detects_external_change(self, tmp_path: Path) -> None:
+        p = tmp_path / ".env"
+        p.write_text("KEY=old\n")
+        os.utime(p, ns=(1_000_000_000, 1_000_000_000))
+        env = EnvFile(p)
+        assert env.read("KEY") == "old"
+        p.write_text("KEY=new\n")
+        assert env.read("KEY") == "new"
+
+    def test_read_all_returns_copy(self, tmp_path: Path) -> None:
+        p = tmp_path / ".env"
+        p.write_text("KEY=val\n")
+        os.utime(p, ns=(1_000_000_000, 1_000_000_000))
+        env = EnvFile(p)
+        env.read_all()["KEY"] = "mutated"
+        assert env.read("KEY") == "val"
+
+    def test_unchanged_write_leaves_file_alone(self, tmp_path: Path) -> None:
+        p = tmp_path / ".env"
+        env = EnvFile(p)
+        env.write(A="1", B="2")
+        os.utime(p, ns=(1_000_000_000, 1_000_000_000))
+        env.write(B="2")
+        assert p.stat().st_mtime_ns == 1_000_000_000
+        env.write(B="3")
+        assert p.stat().st_mtime_ns != 1_000_000_000
+        assert p.read_text() == 'A="1"\nB="3"\n'
+
+    def test_write_normalises_unquoted_file(self, tmp_path: Path) -> None:
+        p = tmp_path / ".env"
+        p.write_text("# note\nA=1\n")
+        EnvFile(p).write(A="1")
+        assert p.read_text() == 'A="1"\n'
@@ -2,13 +2,16 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 from pathlib import Path
+from typing import Any
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from aiohttp import web
-from aiohttp.test_utils import TestClient, TestServer
+from aiohttp.streams import StreamReader
+from aiohttp.test_utils import TestClient, TestServer, make_mocked_request
 
 from app.runtime.services.otel import (
     _reset_otel_state,
@@ -30,6 +33,14 @@ _FAKE_CS = (
     "LiveEndpoint=https://eastus.livediagnostics.monitor.azure.com/;"
     "ApplicationId=deadbeef-1234-5678-9abc-def012345678"
 )
+# First 8 + last 4 chars of the _FAKE_CS instrumentation key, 20 stars between.
+_EXPECTED_MASK = "00000000" + "*" * 20 + "ffff"
+_EXPECTED_PORTAL_FRAGMENTS = ("portal.azure.com", "sub-123", "test-rg", "test-ai")
+_EXPECT_CAM_KWARGS = {
+    "connection_string": _FAKE_CS,
+    "sampling_ratio": 0.5,
+    "enable_live_metrics": False,
+}
 
 
 # -----------------------------------------------------------------------
@@ -114,11 +125,8 @@ class TestMonitoringConfigStore:
         d = store.to_dict()
         assert "connection_string" not in d
         assert d["connection_string_set"] is True
-        assert d["connection_string_masked"]
-        assert "*" in d["connection_string_masked"]
         # Should only show first 8 and last 4 chars of the ikey
-        assert d["connection_string_masked"].startswith("00000000")
-        assert d["connection_string_masked"].endswith("ffff")
+        assert d["connection_string_masked"] == _EXPECTED_MASK
         # Must NOT contain endpoints or full key
         assert "IngestionEndpoint" not in d["connection_string_masked"]
         assert "LiveEndpoint" not in d["connection_string_masked"]
@@ -140,11 +148,8 @@ class TestMonitoringConfigStore:
             connection_string=_FAKE_CS,
             subscription_id="sub-123",
         )
-        d = store.to_dict()
-        assert "portal.azure.com" in d["portal_url"]
-        assert "sub-123" in d["portal_url"]
-        assert "test-rg" in d["portal_url"]
-        assert "test-ai" in d["portal_url"]
+        url = store.to_dict()["portal_url"]
+        assert all(f in url for f in _EXPECTED_PORTAL_FRAGMENTS)
 
     def test_to_dict_grafana_dashboard_url(self, tmp_path: Path) -> None:
         store = MonitoringConfigStore(path=tmp_path / "mon.json")
@@ -158,12 +163,9 @@ class TestMonitoringConfigStore:
         )
         d = store.to_dict()
         url = d["grafana_dashboard_url"]
-        assert "portal.azure.com" in url
+        assert all(f in url for f in _EXPECTED_PORTAL_FRAGMENTS)
         assert "AzureGrafana.ReactView" in url
         assert "AgentFramework" in url
-        assert "sub-123" in url
-        assert "test-rg" in url
-        assert "test-ai" in url
         # Slashes in the resource ID must be percent-encoded
         assert "%2F" in url
 
@@ -231,11 +233,8 @@ class TestOtel:
 
         assert result is True
         assert is_active() is True
-        mock_cam.assert_called_once_with(
-            connection_string=_FAKE_CS,
-            sampling_ratio=0.5,
-            enable_live_metrics=False,
-        )
+        assert mock_cam.call_count == 1
+        assert mock_cam.call_args.kwargs == _EXPECT_CAM_KWARGS
 
     def test_configure_otel_empty_string(self) -> None:
         result = configure_otel("")
@@ -259,7 +258,7 @@ class TestOtel:
             result = configure_otel(_FAKE_CS)
 
         assert result is True
-        mock_cam.assert_called_once()  # only first call
+        assert mock_cam.call_count == 1  # only first call
 
     def test_shutdown_otel_when_inactive(self) -> None:
         # Should be a no-op
@@ -286,9 +285,9 @@ class TestOtel:
             shutdown_otel()
 
         assert is_active() is False
-        mock_tp.shutdown.assert_called_once()
-        mock_mp.shutdown.assert_called_once()
-        mock_lp.shutdown.assert_called_once()
+        assert mock_tp.shutdown.call_count == 1
+        assert mock_mp.shutdown.call_count == 1
+        assert mock_lp.shutdown.call_count == 1
 
     def test_agent_span_noop_when_inactive(self) -> None:
         with agent_span("test.span") as span:
@@ -313,9 +312,10 @@ class TestOtel:
             with agent_span("test.span", attributes={"key": "val"}) as span:
                 assert span is mock_inner_span
 
-        mock_tracer.start_as_current_span.assert_called_once_with(
-            "test.span", attributes={"key": "val"}
-        )
+        call = mock_tracer.start_as_current_span.call_args
+        assert mock_tracer.start_as_current_span.call_count == 1
+        assert call.args == ("test.span",)
+        assert call.kwargs == {"attributes": {"key": "val"}}
 
     def test_record_event_noop_when_inactive(self) -> None:
         # Should not raise
@@ -335,7 +335,9 @@ class TestOtel:
         with patch("opentelemetry.trace.get_current_span", return_value=mock_span):
             record_event("agent_error", {"error": "boom"})
 
-        mock_span.add_event.assert_called_once_with("agent_error", attributes={"error": "boom"})
+        assert mock_span.add_event.call_count == 1
+        assert mock_span.add_event.call_args.args == ("agent_error",)
+        assert mock_span.add_event.call_args.kwargs == {"attributes": {"error": "boom"}}
 
     def test_set_span_attribute_noop_when_inactive(self) -> None:
         set_span_attribute("key", "value")
@@ -354,7 +356,8 @@ class TestOtel:
         with patch("opentelemetry.trace.get_current_span", return_value=mock_span):
             set_span_attribute("chat.response_length", 42)
 
-        mock_span.set_attribute.assert_called_once_with("chat.response_length", 42)
+        assert mock_span.set_attribute.call_count == 1
+        assert mock_span.set_attribute.call_args.args == ("chat.response_length", 42)
 
     def test_invoke_agent_span_noop_when_inactive(self) -> None:
         with invoke_agent_span("polyclaw") as span:
@@ -398,6 +401,33 @@ def _build_app(setup_fn) -> web.Application:
     return app
 
 
+async def _invoke(
+    routes, method: str, path: str, json_body: Any = None,
+) -> tuple[int, dict[str, Any]]:
+    """Resolve *path* against the routes and call the handler in-process.
+
+    Skips the TCP loopback and HTTP parser of ``TestClient`` for tests that
+    only assert on the status code and JSON body of a single handler.
+    """
+    router = web.UrlDispatcher()
+    routes.register(router)
+    headers: dict[str, str] = {}
+    kwargs: dict[str, Any] = {}
+    if json_body is not None:
+        raw = json.dumps(json_body).encode()
+        payload = StreamReader(
+            MagicMock(_reading_paused=False), 2**16, loop=asyncio.get_running_loop(),
+        )
+        payload.feed_data(raw)
+        payload.feed_eof()
+        headers = {"Content-Type": "application/json", "Content-Length": str(len(raw))}
+        kwargs["payload"] = payload
+    req = make_mocked_request(method, path, headers=headers, **kwargs)
+    match = await router.resolve(req)
+    resp = await match.handler(req)
+    return resp.status, json.loads(resp.body)
+
+
 class TestMonitoringRoutes:
     """Tests for the /api/monitoring route handler."""
 
@@ -436,59 +466,42 @@ class TestMonitoringRoutes:
     # -- GET /api/monitoring/config ----------------------------------------
 
     async def test_get_config_defaults(self, routes) -> None:
-        app = _build_app(routes.register)
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get("/api/monitoring/config")
-            assert resp.status == 200
-            data = await resp.json()
-            assert data["enabled"] is False
-            assert data["connection_string_set"] is False
-            assert "otel_status" in data
-            assert data["otel_status"]["active"] is False
+        status, data = await _invoke(routes, "GET", "/api/monitoring/config")
+        assert status == 200
+        assert data["enabled"] is False
+        assert data["connection_string_set"] is False
+        assert "otel_status" in data
+        assert data["otel_status"]["active"] is False
 
     async def test_get_config_with_connection_string(self, store, routes) -> None:
         store.update(enabled=True, connection_string=_FAKE_CS)
-        app = _build_app(routes.register)
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get("/api/monitoring/config")
-            data = await resp.json()
-            assert data["connection_string_set"] is True
-            # Raw secret must not appear
-            assert _FAKE_CS not in json.dumps(data)
+        _, data = await _invoke(routes, "GET", "/api/monitoring/config")
+        assert data["connection_string_set"] is True
+        # Raw secret must not appear
+        assert _FAKE_CS not in json.dumps(data)
 
     async def test_get_config_active_when_configured(self, store, routes) -> None:
         """otel_status.active should be True when monitoring is configured,
         even if configure_otel() was never called in this process (split mode)."""
         store.update(enabled=True, connection_string=_FAKE_CS)
-        app = _build_app(routes.register)
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get("/api/monitoring/config")
-            data = await resp.json()
-            assert data["otel_status"]["active"] is True
+        resp = await routes._get_config(make_mocked_request("GET", "/api/monitoring/config"))
+        assert json.loads(resp.body)["otel_status"]["active"] is True
 
     # -- POST /api/monitoring/config ---------------------------------------
 
     async def test_save_config_enable(self, store, routes) -> None:
-        app = _build_app(routes.register)
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.post(
-                "/api/monitoring/config",
-                json={"enabled": True, "connection_string": _FAKE_CS},
-            )
-            assert resp.status == 200
-            data = await resp.json()
-            assert data["status"] in ("ok", "warning")
+        status, data = await _invoke(
+            routes, "POST", "/api/monitoring/config",
+            {"enabled": True, "connection_string": _FAKE_CS},
+        )
+        assert status == 200
+        assert data["status"] in ("ok", "warning")
 
         assert store.enabled is True
         assert store.connection_string == _FAKE_CS
 
     async def test_save_config_clamps_sampling(self, store, routes) -> None:
-        app = _build_app(routes.register)
-        async with TestClient(TestServer(app)) as client:
-            await client.post(
-                "/api/monitoring/config",
-                json={"sampling_ratio": 2.5},
-            )
+        await _invoke(routes, "POST", "/api/monitoring/config", {"sampling_ratio": 2.5})
         assert store.config.sampling_ratio == 1.0  # clamped to max 1.0
 
     async def test_save_config_disable_shuts_down_otel(self, store, routes) -> None:
@@ -503,77 +516,55 @@ class TestMonitoringRoutes:
         assert is_active() is True
 
         store.update(enabled=True, connection_string=_FAKE_CS)
-        app = _build_app(routes.register)
-        async with TestClient(TestServer(app)) as client:
-            with (
-                patch("opentelemetry.trace.get_tracer_provider", return_value=MagicMock()),
-                patch("opentelemetry.metrics.get_meter_provider", return_value=MagicMock()),
-                patch("opentelemetry._logs.get_logger_provider", return_value=MagicMock()),
-            ):
-                resp = await client.post(
-                    "/api/monitoring/config",
-                    json={"enabled": False},
-                )
-                assert resp.status == 200
-                data = await resp.json()
-                assert "shut down" in data["message"].lower() or "disabled" in data["message"].lower()
+        with (
+            patch("opentelemetry.trace.get_tracer_provider", return_value=MagicMock()),
+            patch("opentelemetry.metrics.get_meter_provider", return_value=MagicMock()),
+            patch("opentelemetry._logs.get_logger_provider", return_value=MagicMock()),
+        ):
+            status, data = await _invoke(
+                routes, "POST", "/api/monitoring/config", {"enabled": False},
+            )
+        assert status == 200
+        assert "shut down" in data["message"].lower() or "disabled" in data["message"].lower()
 
     # -- GET /api/monitoring/status ----------------------------------------
 
     async def test_get_status(self, routes) -> None:
-        app = _build_app(routes.register)
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get("/api/monitoring/status")
-            assert resp.status == 200
-            data = await resp.json()
-            assert data["active"] is False
+        status, data = await _invoke(routes, "GET", "/api/monitoring/status")
+        assert status == 200
+        assert data["active"] is False
 
     # -- POST /api/monitoring/test -----------------------------------------
 
     async def test_test_connection_valid(self, routes) -> None:
-        app = _build_app(routes.register)
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.post(
-                "/api/monitoring/test",
-                json={"connection_string": _FAKE_CS},
-            )
-            assert resp.status == 200
-            data = await resp.json()
-            assert data["status"] == "ok"
-            assert data["ingestion_endpoint"]
+        status, data = await _invoke(
+            routes, "POST", "/api/monitoring/test", {"connection_string": _FAKE_CS},
+        )
+        assert status == 200
+        assert data["status"] == "ok"
+        assert data["ingestion_endpoint"]
 
     async def test_test_connection_empty(self, routes) -> None:
-        app = _build_app(routes.register)
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.post(
-                "/api/monitoring/test",
-                json={"connection_string": ""},
-            )
-            assert resp.status == 400
+        status, _ = await _invoke(
+            routes, "POST", "/api/monitoring/test", {"connection_string": ""},
+        )
+        assert status == 400
 
     async def test_test_connection_missing_ikey(self, routes) -> None:
-        app = _build_app(routes.register)
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.post(
-                "/api/monitoring/test",
-                json={"connection_string": "IngestionEndpoint=https://example.com/"},
-            )
-            assert resp.status == 400
-            data = await resp.json()
-            assert "instrumentationkey" in data["message"].lower()
+        status, data = await _invoke(
+            routes, "POST", "/api/monitoring/test",
+            {"connection_string": "IngestionEndpoint=https://example.com/"},
+        )
+        assert status == 400
+        assert "instrumentationkey" in data["message"].lower()
 
     async def test_test_connection_missing_ingestion(self, routes) -> None:
-        app = _build_app(routes.register)
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.post(
-                "/api/monitoring/test",
-                json={
-                    "connection_string": "InstrumentationKey=00000000-0000-0000-0000-ffffffffffff"
-                },
-            )
-            assert resp.status == 400
-            data = await resp.json()
-            assert "ingestionendpoint" in data["message"].lower()
+        status, data = await _invoke(
+            routes, "POST", "/api/monitoring/test",
+            {"connection_string": "InstrumentationKey=00000000-0000-0000-0000-ffffffffffff"},
+        )
+        assert status == 400
+        assert "ingestionendpoint" in data["message"].lower()
 
     # -- POST /api/monitoring/provision ------------------------------------
 
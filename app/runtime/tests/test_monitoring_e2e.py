@@ -4,8 +4,9 @@ telemetry, query Log Analytics, and tear down.
 Provisions an Application Insights resource backed by a Log Analytics
 workspace, configures the ``azure-monitor-opentelemetry`` distro to
 export telemetry, creates custom spans and log records, waits for
-ingestion, queries the workspace via ``az monitor log-analytics query``,
-verifies the data arrived, then deletes all resources.
+ingestion, queries the workspace via the Log Analytics REST API
+(``azure-monitor-query``, falling back to ``az monitor log-analytics
+query``), verifies the data arrived, then deletes all resources.
 
 Usage
 -----
@@ -16,33 +17,77 @@ Requires:
     - ``az`` CLI installed and logged in (``az login``)
     - An active Azure subscription
     - ``pip install azure-monitor-opentelemetry opentelemetry-api opentelemetry-sdk``
+    - Optional: ``pip install azure-monitor-query`` to query in-process
+      instead of paying ``az`` CLI startup on every poll
 """
 from __future__ import annotations
 
+import asyncio
+import atexit
 import json
 import logging
+import os
+import secrets
 import subprocess
+import threading
 import time
-import uuid
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import IO, Any
 
 import pytest
 
+try:
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so the
+    # existing except clauses cover both parsers.
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
 logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
 # Configuration
 # ---------------------------------------------------------------------------
 
-_UNIQUE = uuid.uuid4().hex[:8]
-RESOURCE_GROUP = f"otel-test-{_UNIQUE}-rg"
-APP_INSIGHTS_NAME = f"otel-test-{_UNIQUE}-ai"
-WORKSPACE_NAME = f"otel-test-{_UNIQUE}-ws"
 LOCATION = "eastus"
 TIMEOUT_PROVISION = 300  # seconds
 TIMEOUT_QUERY = 60
-
-# Marker that we embed in spans so we can query for it.
-TEST_MARKER = f"polyclaw-otel-e2e-{_UNIQUE}"
+TIMEOUT_FLUSH_MS = 5_000
+TIMEOUT_TEARDOWN = 90
+KQL_LOOKBACK = "10m"
+_LOG_ANALYTICS_SCOPE = "https://api.loganalytics.io/.default"
+# Export batches every 500ms instead of the SDK default of 5s so the
+# final force_flush has little left to do.
+_BATCH_SCHEDULE_DELAY_MS = "500"
+
+# Set once configure_azure_monitor() has run; cleared by _shutdown_otel().
+_OTEL_CONFIGURED = False
+# Set once the application-insights CLI extension is known to be installed.
+_EXTENSION_READY = False
+
+
+@dataclass(frozen=True)
+class _RunNames:
+    """Resource names and telemetry marker for one provisioning run."""
+
+    resource_group: str
+    app_insights: str
+    workspace: str
+    # Marker that we embed in spans so we can query for it.
+    marker: str
+
+    @classmethod
+    def generate(cls) -> _RunNames:
+        unique = secrets.token_hex(4)
+        return cls(
+            resource_group=f"otel-test-{unique}-rg",
+            app_insights=f"otel-test-{unique}-ai",
+            workspace=f"otel-test-{unique}-ws",
+            marker=f"polyclaw-otel-e2e-{unique}",
+        )
 
 
 # ---------------------------------------------------------------------------
@@ -53,10 +98,66 @@ TEST_MARKER = f"polyclaw-otel-e2e-{_UNIQUE}"
 def _az(
     *args: str, check: bool = True, timeout: int = 120
 ) -> subprocess.CompletedProcess[str]:
-    """Run an ``az`` CLI command and return the result."""
+    """Run an ``az`` CLI command and return the result.
+
+    stdout/stderr are drained by reader threads while the CLI runs, so a
+    hung call is detected by ``wait(timeout)`` and killed without first
+    blocking on a full pipe.
+    """
+    cmd = ["az", *args, "--output", "json"]
+    logger.info("[az] %s", " ".join(cmd))
+    proc = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    out: list[str] = []
+    err: list[str] = []
+    readers = [
+        threading.Thread(target=_drain, args=(stream, buf), daemon=True)
+        for stream, buf in ((proc.stdout, out), (proc.stderr, err))
+    ]
+    for t in readers:
+        t.start()
+    try:
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        for t in readers:
+            t.join()
+    result = subprocess.CompletedProcess(cmd, proc.returncode, "".join(out), "".join(err))
+    return _checked(result, check)
+
+
+def _drain(stream: IO[str], buf: list[str]) -> None:
+    buf.append(stream.read())
+
+
+async def _az_async(
+    *args: str, check: bool = True, timeout: int = 120
+) -> subprocess.CompletedProcess[str]:
+    """Async variant of :func:`_az` so independent calls can overlap."""
     cmd = ["az", *args, "--output", "json"]
     logger.info("[az] %s", " ".join(cmd))
-    result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        out, err = await asyncio.wait_for(proc.communicate(), timeout)
+    except TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise subprocess.TimeoutExpired(cmd, timeout) from None
+    result = subprocess.CompletedProcess(
+        cmd, proc.returncode or 0, out.decode(), err.decode(),
+    )
+    return _checked(result, check)
+
+
+def _checked(
+    result: subprocess.CompletedProcess[str], check: bool
+) -> subprocess.CompletedProcess[str]:
     if check and result.returncode != 0:
         raise RuntimeError(
             f"az command failed (rc={result.returncode}):\n{result.stderr}"
@@ -64,68 +165,94 @@ def _az(
     return result
 
 
-def _az_json(*args: str, **kwargs) -> dict | list | None:
-    """Run ``az`` and parse JSON output."""
-    result = _az(*args, **kwargs)
+def _parse_json(result: subprocess.CompletedProcess[str]) -> dict | list | None:
     if result.returncode != 0:
         return None
     try:
-        return json.loads(result.stdout)
+        return _json_loads(result.stdout)
     except json.JSONDecodeError:
         return None
 
 
+async def _az_json_async(*args: str, **kwargs) -> dict | list | None:
+    """Run ``az`` asynchronously and parse JSON output."""
+    return _parse_json(await _az_async(*args, **kwargs))
+
+
 # ---------------------------------------------------------------------------
 # Resource lifecycle
 # ---------------------------------------------------------------------------
 
 
-def _ensure_extension() -> None:
-    """Ensure the ``application-insights`` CLI extension is installed."""
-    _az("extension", "add", "--name", "application-insights", "--yes", check=False)
+async def _ensure_extension() -> None:
+    """Ensure the ``application-insights`` CLI extension is installed.
+
+    ``az extension add`` consults the registry even when the extension is
+    present, so probe with the much cheaper ``extension show`` first.
+    """
+    global _EXTENSION_READY
+    if _EXTENSION_READY:
+        return
+    probe = await _az_async(
+        "extension", "show", "--name", "application-insights", check=False, timeout=15,
+    )
+    if probe.returncode == 0:
+        _EXTENSION_READY = True
+        return
+    added = await _az_async(
+        "extension", "add", "--name", "application-insights", "--yes", check=False,
+    )
+    _EXTENSION_READY = added.returncode == 0
 
 
-def _create_resource_group() -> None:
-    logger.info("Creating resource group %s in %s ...", RESOURCE_GROUP, LOCATION)
-    _az("group", "create", "--name", RESOURCE_GROUP, "--location", LOCATION)
+async def _create_resource_group(names: _RunNames) -> None:
+    rg = names.resource_group
+    logger.info("Creating resource group %s in %s ...", rg, LOCATION)
+    await _az_async("group", "create", "--name", rg, "--location", LOCATION)
 
 
-def _create_workspace() -> str:
-    """Create a Log Analytics workspace. Returns the workspace resource ID."""
-    logger.info("Creating Log Analytics workspace %s ...", WORKSPACE_NAME)
-    result = _az_json(
+async def _create_workspace(names: _RunNames) -> tuple[str, str]:
+    """Create a Log Analytics workspace.
+
+    Returns ``(resource_id, customer_id)``.  The create response already
+    carries the ``customerId`` GUID used for querying, so no follow-up
+    ``workspace show`` call is needed.
+    """
+    logger.info("Creating Log Analytics workspace %s ...", names.workspace)
+    result = await _az_json_async(
         "monitor",
         "log-analytics",
         "workspace",
         "create",
         "--workspace-name",
-        WORKSPACE_NAME,
+        names.workspace,
         "--resource-group",
-        RESOURCE_GROUP,
+        names.resource_group,
         "--location",
         LOCATION,
         timeout=TIMEOUT_PROVISION,
     )
     assert result and isinstance(result, dict), "Failed to create workspace"
     ws_id: str = result["id"]
-    logger.info("Workspace created: %s", ws_id)
-    return ws_id
+    customer_id: str = result["customerId"]
+    logger.info("Workspace created: %s (customerId=%s)", ws_id, customer_id)
+    return ws_id, customer_id
 
 
-def _create_app_insights(ws_id: str) -> str:
+async def _create_app_insights(names: _RunNames, ws_id: str) -> str:
     """Create Application Insights linked to the workspace. Returns the connection string."""
-    logger.info("Creating Application Insights %s ...", APP_INSIGHTS_NAME)
-    result = _az_json(
+    logger.info("Creating Application Insights %s ...", names.app_insights)
+    result = await _az_json_async(
         "monitor",
         "app-insights",
         "component",
         "create",
         "--app",
-        APP_INSIGHTS_NAME,
+        names.app_insights,
         "--location",
         LOCATION,
         "--resource-group",
-        RESOURCE_GROUP,
+        names.resource_group,
         "--workspace",
         ws_id,
         "--application-type",
@@ -139,31 +266,23 @@ def _create_app_insights(ws_id: str) -> str:
     return cs
 
 
-def _get_workspace_id() -> str:
-    """Return the Log Analytics workspace ``customerId`` (GUID) for querying."""
-    result = _az_json(
-        "monitor",
-        "log-analytics",
-        "workspace",
-        "show",
-        "--workspace-name",
-        WORKSPACE_NAME,
-        "--resource-group",
-        RESOURCE_GROUP,
-    )
-    assert result and isinstance(result, dict)
-    customer_id: str = result["customerId"]
-    logger.info("Workspace customerId: %s", customer_id)
-    return customer_id
+async def _provision(names: _RunNames) -> tuple[str, str]:
+    """Provision all resources. Returns ``(connection_string, customer_id)``."""
+    # The CLI extension install and the resource group create are
+    # independent -- overlap them.
+    await asyncio.gather(_ensure_extension(), _create_resource_group(names))
+    ws_id, customer_id = await _create_workspace(names)
+    cs = await _create_app_insights(names, ws_id)
+    return cs, customer_id
 
 
-def _delete_resource_group() -> None:
-    logger.info("Deleting resource group %s ...", RESOURCE_GROUP)
+def _delete_resource_group(names: _RunNames) -> None:
+    logger.info("Deleting resource group %s ...", names.resource_group)
     _az(
         "group",
         "delete",
         "--name",
-        RESOURCE_GROUP,
+        names.resource_group,
         "--yes",
         "--no-wait",
         check=False,
@@ -176,56 +295,77 @@ def _delete_resource_group() -> None:
 # ---------------------------------------------------------------------------
 
 
-def _configure_and_send_telemetry(connection_string: str) -> None:
-    """Configure the Azure Monitor distro and emit test spans + logs."""
-    from azure.monitor.opentelemetry import configure_azure_monitor
+def _configure_and_send_telemetry(connection_string: str, marker: str) -> None:
+    """Configure the Azure Monitor distro and emit test spans + logs.
 
-    configure_azure_monitor(
-        connection_string=connection_string,
-        sampling_ratio=1.0,
-        enable_live_metrics=False,
-    )
+    The distro is configured once per process; later calls reuse the
+    existing tracer and logger providers.
+    """
+    global _OTEL_CONFIGURED
+    if not _OTEL_CONFIGURED:
+        from azure.monitor.opentelemetry import configure_azure_monitor
+
+        # The distro builds its own Batch{Span,LogRecord}Processor; both read
+        # their schedule delay from the standard OTel environment variables.
+        os.environ.setdefault("OTEL_BSP_SCHEDULE_DELAY", _BATCH_SCHEDULE_DELAY_MS)
+        os.environ.setdefault("OTEL_BLRP_SCHEDULE_DELAY", _BATCH_SCHEDULE_DELAY_MS)
+        configure_azure_monitor(
+            connection_string=connection_string,
+            sampling_ratio=1.0,
+            enable_live_metrics=False,
+        )
+        _OTEL_CONFIGURED = True
 
     from opentelemetry import trace
 
     tracer = trace.get_tracer("polyclaw.test")
 
-    # Create a parent span with the test marker.
-    with tracer.start_as_current_span(
+    # Create a parent span with the test marker.  Nothing runs inside these
+    # spans, so start/end them explicitly rather than making each one the
+    # current span via a context manager.
+    parent = tracer.start_span(
         "test.e2e_parent",
-        attributes={"test.marker": TEST_MARKER, "test.suite": "monitoring_e2e"},
-    ) as parent:
-        parent.add_event("test_event", attributes={"detail": "e2e event"})
+        attributes={"test.marker": marker, "test.suite": "monitoring_e2e"},
+    )
+    parent.add_event("test_event", attributes={"detail": "e2e event"})
 
-        # Nested child span.
-        with tracer.start_as_current_span(
-            "test.e2e_child",
-            attributes={"test.marker": TEST_MARKER, "test.step": "child"},
-        ):
-            pass
+    # Nested child span.
+    child = tracer.start_span(
+        "test.e2e_child",
+        context=trace.set_span_in_context(parent),
+        attributes={"test.marker": marker, "test.step": "child"},
+    )
+    child.end()
+    parent.end()
 
     # Also emit a log record through Python logging so it's captured
     # by the OTel log handler.
     logging.getLogger("polyclaw.test").warning(
-        "E2E monitoring test log -- marker=%s", TEST_MARKER
+        "E2E monitoring test log -- marker=%s", marker
     )
 
-    # Flush everything.
-    tp = trace.get_tracer_provider()
-    if hasattr(tp, "force_flush"):
-        tp.force_flush(timeout_millis=30_000)
-
+    # Flush traces and logs concurrently -- both exports are I/O-bound and
+    # independent, so they share a single TIMEOUT_FLUSH_MS budget.
     from opentelemetry._logs import get_logger_provider
 
-    lp = get_logger_provider()
-    if hasattr(lp, "force_flush"):
-        lp.force_flush(timeout_millis=30_000)
+    providers = [
+        p for p in (trace.get_tracer_provider(), get_logger_provider())
+        if hasattr(p, "force_flush")
+    ]
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="otel-flush")
+    futures = [pool.submit(p.force_flush, TIMEOUT_FLUSH_MS) for p in providers]
+    _, pending = wait(futures, timeout=TIMEOUT_FLUSH_MS / 1000)
+    pool.shutdown(wait=False)
+    if pending:
+        logger.warning("[otel] %d provider(s) did not flush in time", len(pending))
 
-    logger.info("[otel] Telemetry flushed -- marker=%s", TEST_MARKER)
+    logger.info("[otel] Telemetry flushed -- marker=%s", marker)
 
 
 def _shutdown_otel() -> None:
     """Shut down all OTel providers to release resources."""
+    global _OTEL_CONFIGURED
+    _OTEL_CONFIGURED = False
     try:
         from opentelemetry import trace, metrics
         from opentelemetry._logs import get_logger_provider
@@ -252,8 +392,49 @@ def _shutdown_otel() -> None:
 # ---------------------------------------------------------------------------
 
 
-def _query_log_analytics(workspace_customer_id: str, kql: str) -> list[dict]:
-    """Execute a KQL query against the Log Analytics workspace via az CLI."""
+def _make_logs_client() -> tuple[Any | None, Any | None]:
+    """Return ``(LogsQueryClient, credential)`` for in-process queries.
+
+    Both are built once per run and shared by every poll: constructing a
+    ``DefaultAzureCredential`` walks its whole provider chain, and the
+    token it acquires here is cached for the later queries.  Returns
+    ``(None, None)`` if ``azure-monitor-query`` is missing.
+    """
+    try:
+        from azure.identity import DefaultAzureCredential
+        from azure.monitor.query import LogsQueryClient
+    except ImportError:
+        logger.info("[query] azure-monitor-query not installed -- using az CLI")
+        return None, None
+    credential = DefaultAzureCredential()
+    try:
+        credential.get_token(_LOG_ANALYTICS_SCOPE)
+    except Exception:
+        logger.warning("[query] Token prefetch failed", exc_info=True)
+    return LogsQueryClient(credential), credential
+
+
+def _close_logs_client(client: Any | None, credential: Any | None) -> None:
+    for obj in (client, credential):
+        if obj is None:
+            continue
+        try:
+            obj.close()
+        except Exception:
+            logger.warning("[query] Error closing %s", type(obj).__name__, exc_info=True)
+
+
+def _query_log_analytics(
+    workspace_customer_id: str, kql: str, client: Any | None = None,
+) -> list[dict]:
+    """Execute a KQL query against the Log Analytics workspace.
+
+    Uses *client* (a ``LogsQueryClient``) when given, otherwise shells out
+    to the az CLI.
+    """
+    if client is not None:
+        return _query_log_analytics_rest(client, workspace_customer_id, kql)
+
     result = _az(
         "monitor",
         "log-analytics",
@@ -269,7 +450,7 @@ def _query_log_analytics(workspace_customer_id: str, kql: str) -> list[dict]:
         logger.warning("[query] Query failed: %s", result.stderr[:500])
         return []
     try:
-        data = json.loads(result.stdout)
+        data = _json_loads(result.stdout)
         if isinstance(data, list):
             return data
         return []
@@ -277,28 +458,73 @@ def _query_log_analytics(workspace_customer_id: str, kql: str) -> list[dict]:
         return []
 
 
+def _query_log_analytics_rest(client: Any, workspace_customer_id: str, kql: str) -> list[dict]:
+    """Execute a KQL query in-process via ``LogsQueryClient``."""
+    from azure.monitor.query import LogsQueryStatus
+
+    try:
+        response = client.query_workspace(
+            workspace_customer_id, kql, timespan=timedelta(hours=1),
+        )
+    except Exception:
+        logger.warning("[query] Query failed", exc_info=True)
+        return []
+    tables = (
+        response.tables if response.status == LogsQueryStatus.SUCCESS
+        else response.partial_data
+    )
+    return [
+        dict(zip(table.columns, row))
+        for table in tables or []
+        for row in table.rows
+    ]
+
+
+def _poll_delays(
+    probe_delay: float, initial_interval: float, max_interval: float,
+) -> Iterator[float]:
+    """Yield the pause after each failed poll: one probe gap, then x1.5 backoff."""
+    yield probe_delay
+    interval = initial_interval
+    while True:
+        yield interval
+        interval = min(max_interval, interval * 1.5)
+
+
 def _wait_for_telemetry(
     workspace_customer_id: str,
+    marker: str,
     *,
+    client: Any | None = None,
     max_wait: int = 360,
-    poll_interval: int = 30,
+    probe_delay: float = 30.0,
+    initial_interval: float = 5.0,
+    max_interval: float = 30.0,
 ) -> list[dict]:
     """Poll Log Analytics until the test marker appears in AppTraces or AppDependencies.
 
-    Application Insights ingestion typically takes 2-5 minutes.
+    Application Insights ingestion typically takes 2-5 minutes.  The
+    workspace is probed immediately and again after *probe_delay*; only
+    then does polling back off exponentially (x1.5) from
+    *initial_interval* up to *max_interval*, so rows landing mid-interval
+    are picked up quickly without hammering the API early on.
     """
     # Query both traces (custom spans appear as dependencies or requests)
-    # and AppTraces (log records).
+    # and AppTraces (log records).  The leading time filter keeps Log
+    # Analytics from scanning the whole retention window on reused workspaces.
     kql = (
-        f'AppDependencies | where Properties["test.marker"] == "{TEST_MARKER}" '
+        f"AppDependencies | where TimeGenerated > ago({KQL_LOOKBACK}) "
+        f'| where Properties["test.marker"] == "{marker}" '
         f'| project OperationName=Name, Type="dependency", Marker=Properties["test.marker"] '
         f"| union ("
-        f'AppTraces | where Message contains "{TEST_MARKER}" '
+        f"AppTraces | where TimeGenerated > ago({KQL_LOOKBACK}) "
+        f'| where Message contains "{marker}" '
         f'| project OperationName=OperationName, Type="trace", Marker=Message'
         f") | take 10"
     )
 
     deadline = time.time() + max_wait
+    delays = _poll_delays(probe_delay, initial_interval, max_interval)
     attempt = 0
     while time.time() < deadline:
         attempt += 1
@@ -307,15 +533,80 @@ def _wait_for_telemetry(
             attempt,
             deadline - time.time(),
         )
-        rows = _query_log_analytics(workspace_customer_id, kql)
+        rows = _query_log_analytics(workspace_customer_id, kql, client)
         if rows:
             logger.info("[query] Found %d rows", len(rows))
             return rows
-        time.sleep(poll_interval)
+        time.sleep(min(next(delays), max(0.0, deadline - time.time())))
 
     return []
 
 
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class _MonitoringResources:
+    names: _RunNames
+    connection_string: str
+    workspace_customer_id: str
+    logs_client: Any | None
+
+
+def _join_threads(threads: list[threading.Thread]) -> None:
+    for t in threads:
+        t.join(timeout=TIMEOUT_TEARDOWN)
+
+
+def _teardown_in_background(names: _RunNames) -> None:
+    """Shut down OTel and delete the resource group on daemon threads.
+
+    The test process does not wait on ARM bookkeeping; an ``atexit`` hook
+    joins the threads so the delete request is still issued before exit.
+    """
+    threads = [
+        threading.Thread(target=_shutdown_otel, name="e2e-otel-shutdown", daemon=True),
+        threading.Thread(
+            target=_delete_resource_group, args=(names,), name="e2e-rg-delete", daemon=True,
+        ),
+    ]
+    for t in threads:
+        t.start()
+    atexit.register(_join_threads, threads)
+
+
+@pytest.fixture(scope="module")
+def azure_resources():
+    """Provision Azure monitoring resources once per module, delete after.
+
+    Resource names are generated here, per run, rather than at import time.
+    """
+    names = _RunNames.generate()
+    client = credential = None
+    try:
+        cs, customer_id = asyncio.run(_provision(names))
+
+        logger.info(
+            "Provisioned: app_insights=%s workspace=%s",
+            names.app_insights,
+            names.workspace,
+        )
+
+        client, credential = _make_logs_client()
+        yield _MonitoringResources(
+            names=names,
+            connection_string=cs,
+            workspace_customer_id=customer_id,
+            logs_client=client,
+        )
+
+    finally:
+        _close_logs_client(client, credential)
+        _teardown_in_background(names)
+
+
 # ---------------------------------------------------------------------------
 # Tests
 # ---------------------------------------------------------------------------
@@ -336,37 +627,21 @@ class TestMonitoringE2E:
         5. Tear down all resources
     """
 
+    _names: _RunNames | None = None
     _connection_string: str = ""
     _workspace_customer_id: str = ""
+    _logs_client: Any | None = None
 
     # -- fixtures -----------------------------------------------------------
 
     @pytest.fixture(autouse=True, scope="class")
-    def azure_resources(self, request: pytest.FixtureRequest):
-        """Provision Azure monitoring resources before the test class,
-        delete after."""
-        _ensure_extension()
-        _create_resource_group()
-
-        try:
-            ws_id = _create_workspace()
-            cs = _create_app_insights(ws_id)
-            customer_id = _get_workspace_id()
-
-            request.cls._connection_string = cs
-            request.cls._workspace_customer_id = customer_id
-
-            logger.info(
-                "Provisioned: app_insights=%s workspace=%s",
-                APP_INSIGHTS_NAME,
-                WORKSPACE_NAME,
-            )
-
-            yield
-
-        finally:
-            _shutdown_otel()
-            _delete_resource_group()
+    def _bind_resources(
+        self, request: pytest.FixtureRequest, azure_resources: _MonitoringResources,
+    ) -> None:
+        request.cls._names = azure_resources.names
+        request.cls._connection_string = azure_resources.connection_string
+        request.cls._workspace_customer_id = azure_resources.workspace_customer_id
+        request.cls._logs_client = azure_resources.logs_client
 
     # -- step 1: validate connection string --------------------------------
 
@@ -396,16 +671,19 @@ class TestMonitoringE2E:
     def test_02_send_telemetry(self) -> None:
         """Configure the Azure Monitor distro, emit custom spans + logs,
         and flush the exporters."""
-        _configure_and_send_telemetry(self._connection_string)
+        _configure_and_send_telemetry(self._connection_string, self._names.marker)
         # If we get here without exception, OTel was initialised successfully.
 
     # -- step 3: query Log Analytics to verify arrival ---------------------
 
     def test_03_query_telemetry(self) -> None:
         """Wait for telemetry to appear in Log Analytics and verify it."""
-        rows = _wait_for_telemetry(self._workspace_customer_id)
+        marker = self._names.marker
+        rows = _wait_for_telemetry(
+            self._workspace_customer_id, marker, client=self._logs_client,
+        )
         assert rows, (
-            f"Telemetry with marker {TEST_MARKER} did not appear in "
+            f"Telemetry with marker {marker} did not appear in "
             f"Log Analytics within the polling window."
         )
         logger.info("[step3] Verified %d telemetry rows in Log Analytics", len(rows))
@@ -2,10 +2,17 @@
 
 from __future__ import annotations
 
+import functools
+import json
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any
+
 import pytest
 
 from app.runtime.agent.policy_bridge import (
     build_engine,
+    build_engine_from_config,
     config_to_yaml,
     make_eval_context,
     validate_yaml,
@@ -15,25 +22,44 @@ from app.runtime.agent.policy_bridge import (
 
 # ── Helpers ──────────────────────────────────────────────────────────────
 
+_DEFAULT_BASE: Mapping[str, Any] = MappingProxyType({
+    "hitl_enabled": True,
+    "default_action": "allow",
+    "default_channel": "chat",
+    "context_defaults": {},
+    "tool_policies": {},
+    "model_columns": [],
+    "model_policies": {},
+    "rules": None,
+})
+
+
 def _default_args(**overrides):
     """Return minimal config_to_yaml kwargs with overrides applied."""
-    base = {
-        "hitl_enabled": True,
-        "default_action": "allow",
-        "default_channel": "chat",
-        "context_defaults": {},
-        "tool_policies": {},
-        "model_columns": [],
-        "model_policies": {},
-        "rules": None,
-    }
-    base.update(overrides)
-    return base
+    return {**_DEFAULT_BASE, **overrides}
+
+
+@functools.lru_cache(maxsize=256)
+def _cached_build(yaml_text: str):
+    """Build (once per distinct YAML body) an engine; engines are immutable."""
+    return build_engine(yaml_text)
 
 
 def _resolve(yaml_text: str, **ctx_kwargs) -> str:
     """Build an engine from YAML and resolve a single context."""
-    engine = build_engine(yaml_text)
+    engine = _cached_build(yaml_text)
+    ctx = make_eval_context(**ctx_kwargs)
+    return engine.resolve(ctx)
+
+
+@functools.lru_cache(maxsize=256)
+def _cached_build_direct(config_json: str):
+    return build_engine_from_config(**json.loads(config_json))
+
+
+def _resolve_direct(config: dict[str, Any], **ctx_kwargs) -> str:
+    """Resolve a single context against an engine built without the YAML round-trip."""
+    engine = _cached_build_direct(json.dumps(config, sort_keys=True))
     ctx = make_eval_context(**ctx_kwargs)
     return engine.resolve(ctx)
 
@@ -71,38 +97,41 @@ class TestDisabledGuardrails:
 class TestContextToolPolicies:
     """Context-scoped tool policies (the basic policy matrix)."""
 
-    def test_interactive_tool_policy(self) -> None:
-        yaml_text = config_to_yaml(**_default_args(
-            tool_policies={"interactive": {"run": "hitl", "view": "filter"}},
-        ))
-        assert _resolve(yaml_text, tool_name="run", execution_context="interactive") == "hitl"
-        assert _resolve(yaml_text, tool_name="view", execution_context="interactive") == "filter"
-
-    def test_background_tool_policy(self) -> None:
-        yaml_text = config_to_yaml(**_default_args(
-            tool_policies={"background": {"run": "deny", "view": "allow"}},
-        ))
-        assert _resolve(yaml_text, tool_name="run", execution_context="background") == "deny"
-        assert _resolve(yaml_text, tool_name="view", execution_context="background") == "allow"
-
-    def test_mcp_tool_policy(self) -> None:
-        """Tool IDs starting with 'mcp:' should match via mcp_server field."""
-        yaml_text = config_to_yaml(**_default_args(
-            tool_policies={"interactive": {"mcp:github-mcp-server": "hitl"}},
-        ))
-        assert _resolve(
-            yaml_text, tool_name="mcp:github-mcp-server",
-            mcp_server="github-mcp-server",
-            execution_context="interactive",
-        ) == "hitl"
+    _INTERACTIVE = {"interactive": {"run": "hitl", "view": "filter"}}
+    _BACKGROUND = {"background": {"run": "deny", "view": "allow"}}
+    # Tool IDs starting with 'mcp:' should match via the mcp_server field.
+    _MCP = {"interactive": {"mcp:github-mcp-server": "hitl"}}
+
+    @pytest.mark.parametrize(
+        ("tool_policies", "ctx", "expected"),
+        [
+            (_INTERACTIVE, {"tool_name": "run", "execution_context": "interactive"}, "hitl"),
+            (_INTERACTIVE, {"tool_name": "view", "execution_context": "interactive"}, "filter"),
+            (_BACKGROUND, {"tool_name": "run", "execution_context": "background"}, "deny"),
+            (_BACKGROUND, {"tool_name": "view", "execution_context": "background"}, "allow"),
+            (
+                _MCP,
+                {
+                    "tool_name": "mcp:github-mcp-server",
+                    "mcp_server": "github-mcp-server",
+                    "execution_context": "interactive",
+                },
+                "hitl",
+            ),
+        ],
+        ids=["interactive-run", "interactive-view", "background-run", "background-view", "mcp"],
+    )
+    def test_tool_policy(self, tool_policies, ctx, expected) -> None:
+        config = _default_args(tool_policies=tool_policies)
+        assert _resolve_direct(config, **ctx) == expected
 
     def test_unknown_tool_falls_to_default(self) -> None:
-        yaml_text = config_to_yaml(**_default_args(
+        config = _default_args(
             tool_policies={"interactive": {"run": "hitl"}},
-        ))
+        )
         # "unknown_tool" is not in tool_policies -> falls to global default
-        assert _resolve(
-            yaml_text, tool_name="unknown_tool", execution_context="interactive",
+        assert _resolve_direct(
+            config, tool_name="unknown_tool", execution_context="interactive",
         ) == "allow"
 
 
@@ -112,28 +141,28 @@ class TestContextDefaults:
     """Context-level catch-all defaults."""
 
     def test_context_default_catches_unlisted_tools(self) -> None:
-        yaml_text = config_to_yaml(**_default_args(
+        config = _default_args(
             context_defaults={"interactive": "hitl", "background": "deny"},
-        ))
-        assert _resolve(
-            yaml_text, tool_name="any_tool", execution_context="interactive",
+        )
+        assert _resolve_direct(
+            config, tool_name="any_tool", execution_context="interactive",
         ) == "hitl"
-        assert _resolve(
-            yaml_text, tool_name="any_tool", execution_context="background",
+        assert _resolve_direct(
+            config, tool_name="any_tool", execution_context="background",
         ) == "deny"
 
     def test_tool_policy_beats_context_default(self) -> None:
-        yaml_text = config_to_yaml(**_default_args(
+        config = _default_args(
             context_defaults={"interactive": "deny"},
             tool_policies={"interactive": {"run": "allow"}},
-        ))
+        )
         # Tool policy wins
-        assert _resolve(
-            yaml_text, tool_name="run", execution_context="interactive",
+        assert _resolve_direct(
+            config, tool_name="run", execution_context="interactive",
         ) == "allow"
         # Other tools fall to context default
-        assert _resolve(
-            yaml_text, tool_name="bash", execution_context="interactive",
+        assert _resolve_direct(
+            config, tool_name="bash", execution_context="interactive",
         ) == "deny"
 
 
@@ -143,42 +172,42 @@ class TestModelPolicies:
     """Model-specific tool policies (fallback after context policies)."""
 
     def test_model_policy_resolves(self) -> None:
-        yaml_text = config_to_yaml(**_default_args(
+        config = _default_args(
             model_columns=["gpt-4.1"],
             model_policies={"gpt-4.1": {"interactive": {"run": "deny"}}},
-        ))
-        assert _resolve(
-            yaml_text, tool_name="run",
+        )
+        assert _resolve_direct(
+            config, tool_name="run",
             execution_context="interactive", model="gpt-4.1",
         ) == "deny"
 
     def test_model_policy_beats_context_tool_policy(self) -> None:
-        yaml_text = config_to_yaml(**_default_args(
+        config = _default_args(
             tool_policies={"interactive": {"run": "hitl"}},
             model_columns=["gpt-4.1"],
             model_policies={"gpt-4.1": {"interactive": {"run": "filter"}}},
-        ))
+        )
         # Model policy (more specific) wins over context tool policy
-        assert _resolve(
-            yaml_text, tool_name="run",
+        assert _resolve_direct(
+            config, tool_name="run",
             execution_context="interactive", model="gpt-4.1",
         ) == "filter"
 
     def test_model_policy_for_unlisted_tool(self) -> None:
         """Model policy applies when the tool is not in context tool_policies."""
-        yaml_text = config_to_yaml(**_default_args(
+        config = _default_args(
             tool_policies={"interactive": {"view": "filter"}},
             model_columns=["gpt-4.1"],
             model_policies={"gpt-4.1": {"interactive": {"run": "deny"}}},
-        ))
+        )
         # "run" is not in context tool policies, model policy applies
-        assert _resolve(
-            yaml_text, tool_name="run",
+        assert _resolve_direct(
+            config, tool_name="run",
             execution_context="interactive", model="gpt-4.1",
         ) == "deny"
         # "view" is in context tool policies, that wins
-        assert _resolve(
-            yaml_text, tool_name="view",
+        assert _resolve_direct(
+            config, tool_name="view",
             execution_context="interactive", model="gpt-4.1",
         ) == "filter"
 
@@ -189,7 +218,7 @@ class TestLegacyRules:
     """Rules created via the rule CRUD API."""
 
     def test_rule_matches_tool(self) -> None:
-        yaml_text = config_to_yaml(**_default_args(
+        config = _default_args(
             rules=[{
                 "id": "r1",
                 "name": "block-run",
@@ -198,11 +227,11 @@ class TestLegacyRules:
                 "action": "deny",
                 "enabled": True,
             }],
-        ))
-        assert _resolve(yaml_text, tool_name="run") == "deny"
+        )
+        assert _resolve_direct(config, tool_name="run") == "deny"
 
     def test_disabled_rule_ignored(self) -> None:
-        yaml_text = config_to_yaml(**_default_args(
+        config = _default_args(
             rules=[{
                 "id": "r1",
                 "name": "block-run",
@@ -211,11 +240,11 @@ class TestLegacyRules:
                 "action": "deny",
                 "enabled": False,
             }],
-        ))
-        assert _resolve(yaml_text, tool_name="run") == "allow"
+        )
+        assert _resolve_direct(config, tool_name="run") == "allow"
 
     def test_mcp_scope_rule(self) -> None:
-        yaml_text = config_to_yaml(**_default_args(
+        config = _default_args(
             rules=[{
                 "id": "r2",
                 "name": "block-gh",
@@ -224,14 +253,14 @@ class TestLegacyRules:
                 "action": "deny",
                 "enabled": True,
             }],
-        ))
-        assert _resolve(
-            yaml_text, tool_name="some_tool", mcp_server="github-mcp-server",
+        )
+        assert _resolve_direct(
+            config, tool_name="some_tool", mcp_server="github-mcp-server",
         ) == "deny"
 
     def test_context_default_beats_rule(self) -> None:
         """Context defaults have higher priority than legacy rules."""
-        yaml_text = config_to_yaml(**_default_args(
+        config = _default_args(
             context_defaults={"interactive": "allow"},
             rules=[{
                 "id": "r3",
@@ -241,14 +270,14 @@ class TestLegacyRules:
                 "action": "deny",
                 "enabled": True,
             }],
-        ))
+        )
         # Context default ("allow") wins over rule ("deny")
-        assert _resolve(
-            yaml_text, tool_name="custom_tool", execution_context="interactive",
+        assert _resolve_direct(
+            config, tool_name="custom_tool", execution_context="interactive",
         ) == "allow"
         # Without matching context default, rule fires
-        assert _resolve(
-            yaml_text, tool_name="custom_tool", execution_context="background",
+        assert _resolve_direct(
+            config, tool_name="custom_tool", execution_context="background",
         ) == "deny"
 
 
@@ -276,21 +305,21 @@ class TestPriorityCascade:
         ) == "filter"
 
     def test_model_as_fallback(self) -> None:
-        yaml_text = config_to_yaml(**_default_args(
+        config = _default_args(
             default_action="allow",
             model_columns=["gpt-4.1"],
             model_policies={"gpt-4.1": {"interactive": {"bash": "deny"}}},
-        ))
+        )
         # No context tool policy for bash, model policy applies
-        assert _resolve(
-            yaml_text, tool_name="bash",
+        assert _resolve_direct(
+            config, tool_name="bash",
             execution_context="interactive", model="gpt-4.1",
         ) == "deny"
 
     def test_global_default_is_last_resort(self) -> None:
-        yaml_text = config_to_yaml(**_default_args(default_action="deny"))
-        assert _resolve(
-            yaml_text, tool_name="anything", execution_context="interactive",
+        config = _default_args(default_action="deny")
+        assert _resolve_direct(
+            config, tool_name="anything", execution_context="interactive",
         ) == "deny"
 
 
@@ -299,21 +328,15 @@ class TestPriorityCascade:
 class TestContextFallbacks:
     """Background agents fall back to 'background' context."""
 
-    def test_scheduler_falls_to_background(self) -> None:
-        yaml_text = config_to_yaml(**_default_args(
-            context_defaults={"background": "hitl"},
-        ))
-        assert _resolve(
-            yaml_text, tool_name="run", execution_context="scheduler",
-        ) == "hitl"
-
-    def test_bot_processor_falls_to_background(self) -> None:
-        yaml_text = config_to_yaml(**_default_args(
-            context_defaults={"background": "deny"},
-        ))
-        assert _resolve(
-            yaml_text, tool_name="run", execution_context="bot_processor",
-        ) == "deny"
+    @pytest.mark.parametrize(
+        ("agent_id", "effect"),
+        [("scheduler", "hitl"), ("bot_processor", "deny")],
+    )
+    def test_agent_falls_to_background(self, agent_id: str, effect: str) -> None:
+        config = _default_args(context_defaults={"background": effect})
+        assert _resolve_direct(
+            config, tool_name="run", execution_context=agent_id,
+        ) == effect
 
 
 # ── 8. YAML round-trip ─────────────────────────────────────────────────
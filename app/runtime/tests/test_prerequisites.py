@@ -2,32 +2,54 @@
 
 from __future__ import annotations
 
-from pathlib import Path
+from typing import Any
 from unittest.mock import MagicMock
 
+import pytest
+
 from app.runtime.config.settings import cfg
 from app.runtime.server.setup.prerequisites import PrerequisitesRoutes
 from app.runtime.state.deploy_state import DeployStateStore, DeploymentRecord
 from app.runtime.state.infra_config import InfraConfigStore
 
 
-def _make_routes(
-    tmp_path: Path,
-    deploy_store: DeployStateStore | None = None,
-) -> PrerequisitesRoutes:
+class _InMemoryDeployStateStore(DeployStateStore):
+    """DeployStateStore that keeps its serialised state in memory instead of on disk."""
+
+    def __init__(self) -> None:
+        self.saved: dict[str, Any] = {}
+        super().__init__()
+
+    def _load(self) -> None:
+        pass
+
+    def _save(self) -> None:
+        self.saved = self.to_dict()
+
+
+class _InMemoryInfraConfigStore(InfraConfigStore):
+    """InfraConfigStore that never touches the filesystem."""
+
+    def _load(self) -> None:
+        pass
+
+    def _save(self) -> None:
+        pass
+
+
+def _make_routes(deploy_store: DeployStateStore | None = None) -> PrerequisitesRoutes:
     az = MagicMock()
-    store = InfraConfigStore(path=tmp_path / "infra.json")
-    return PrerequisitesRoutes(az, store, deploy_store=deploy_store)
+    return PrerequisitesRoutes(az, _InMemoryInfraConfigStore(), deploy_store=deploy_store)
 
 
 class TestLinkExistingKeyvault:
-    def test_links_kv_to_current_deployment(self, tmp_path: Path) -> None:
-        ds = DeployStateStore(path=tmp_path / "deploys.json")
+    def test_links_kv_to_current_deployment(self) -> None:
+        ds = _InMemoryDeployStateStore()
         rec = DeploymentRecord.new("local", deploy_id="aaaa1111")
         ds.register(rec)
 
         cfg.write_env(KEY_VAULT_NAME="polyclaw-kv-abc", KEY_VAULT_RG="polyclaw-prereq-rg")
-        routes = _make_routes(tmp_path, deploy_store=ds)
+        routes = _make_routes(deploy_store=ds)
         routes._link_existing_keyvault()
 
         updated = ds.get("aaaa1111")
@@ -37,41 +59,30 @@ class TestLinkExistingKeyvault:
         assert updated.resources[0].resource_type == "keyvault"
         assert "polyclaw-prereq-rg" in updated.resource_groups
 
-    def test_idempotent(self, tmp_path: Path) -> None:
-        ds = DeployStateStore(path=tmp_path / "deploys.json")
+    def test_idempotent(self) -> None:
+        ds = _InMemoryDeployStateStore()
         rec = DeploymentRecord.new("local", deploy_id="bbbb2222")
         ds.register(rec)
 
         cfg.write_env(KEY_VAULT_NAME="polyclaw-kv-xyz", KEY_VAULT_RG="polyclaw-prereq-rg")
-        routes = _make_routes(tmp_path, deploy_store=ds)
+        routes = _make_routes(deploy_store=ds)
         routes._link_existing_keyvault()
         routes._link_existing_keyvault()  # second call should be no-op
 
         updated = ds.get("bbbb2222")
         assert len(updated.resources) == 1
 
-    def test_noop_without_deploy_store(self, tmp_path: Path) -> None:
-        routes = _make_routes(tmp_path, deploy_store=None)
-        cfg.write_env(KEY_VAULT_NAME="polyclaw-kv-nope", KEY_VAULT_RG="rg1")
-        routes._link_existing_keyvault()  # should not raise
-
-    def test_noop_without_active_deployment(self, tmp_path: Path) -> None:
-        ds = DeployStateStore(path=tmp_path / "deploys.json")
-        routes = _make_routes(tmp_path, deploy_store=ds)
-        cfg.write_env(KEY_VAULT_NAME="polyclaw-kv-orphan", KEY_VAULT_RG="rg1")
-        routes._link_existing_keyvault()  # should not raise
-
-    def test_noop_without_kv_name(self, tmp_path: Path) -> None:
-        # Overwrite any leftover env values from earlier tests
-        env_path = cfg.env.path
-        env_path.write_text("")
+    @pytest.mark.parametrize("missing", ["deploy_store", "active_deployment", "kv_name"])
+    def test_noop_when_precondition_missing(self, missing: str) -> None:
+        if missing != "kv_name":
+            cfg.write_env(KEY_VAULT_NAME="polyclaw-kv-orphan", KEY_VAULT_RG="rg1")
 
-        ds = DeployStateStore(path=tmp_path / "deploys.json")
-        rec = DeploymentRecord.new("local", deploy_id="cccc3333")
-        ds.register(rec)
+        ds = None if missing == "deploy_store" else _InMemoryDeployStateStore()
+        if ds is not None and missing != "active_deployment":
+            ds.register(DeploymentRecord.new("local", deploy_id="cccc3333"))
 
-        routes = _make_routes(tmp_path, deploy_store=ds)
-        routes._link_existing_keyvault()
+        routes = _make_routes(deploy_store=ds)
+        routes._link_existing_keyvault()  # should not raise
 
-        updated = ds.get("cccc3333")
-        assert len(updated.resources) == 0
+        if ds is not None:
+            assert all(not rec.resources for rec in ds.all_deployments.values())
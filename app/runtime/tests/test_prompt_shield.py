@@ -2,12 +2,12 @@
 
 from __future__ import annotations
 
-import json
 import urllib.error
-from io import BytesIO
 from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
+import pytest
+
 from app.runtime.services.security.prompt_shield import (
     PromptShieldService,
     _BearerTokenProvider,
@@ -44,50 +44,59 @@ class TestAuthHeader:
         assert header == {"Authorization": "Bearer test-bearer-token"}
 
 
+class _Clock:
+    """Manually advanced clock for deterministic expiry tests."""
+
+    def __init__(self, now: float) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def _token(token: str, expires_on: float) -> SimpleNamespace:
+    return SimpleNamespace(token=token, expires_on=expires_on)
+
+
+def _cred(token: str, expires_on: float) -> MagicMock:
+    """Credential mock whose ``get_token`` returns a fixed access token."""
+    return MagicMock(get_token=MagicMock(return_value=_token(token, expires_on)))
+
+
 class TestBearerTokenProvider:
     """Test _BearerTokenProvider token caching and refresh."""
 
     def test_caches_token(self) -> None:
-        provider = _BearerTokenProvider()
-
-        mock_cred = MagicMock()
-        mock_cred.get_token.return_value = SimpleNamespace(
-            token="tok-1", expires_on=2000.0,
-        )
-        provider._credential = mock_cred
+        provider = _BearerTokenProvider(clock=_Clock(1000.0))
+        mock_cred = provider._credential = _cred("tok-1", 2000.0)
 
-        with patch("time.time", return_value=1000.0):
-            # First call acquires token
-            t1 = provider.get_token()
-            assert t1 == "tok-1"
-            assert mock_cred.get_token.call_count == 1
+        # First call acquires token
+        t1 = provider.get_token()
+        assert t1 == "tok-1"
+        assert mock_cred.get_token.call_count == 1
 
-            # Second call within validity returns cached
-            t2 = provider.get_token()
-            assert t2 == "tok-1"
-            assert mock_cred.get_token.call_count == 1
+        # Second call within validity returns cached
+        t2 = provider.get_token()
+        assert t2 == "tok-1"
+        assert mock_cred.get_token.call_count == 1
 
     def test_refreshes_expired_token(self) -> None:
-        provider = _BearerTokenProvider()
-
-        mock_cred = MagicMock()
-        mock_cred.get_token.return_value = SimpleNamespace(
-            token="tok-1", expires_on=2000.0,
-        )
-        provider._credential = mock_cred
+        clock = _Clock(1000.0)
+        provider = _BearerTokenProvider(clock=clock)
+        mock_cred = provider._credential = _cred("tok-1", 2000.0)
 
-        with patch("time.time", return_value=1000.0):
-            provider.get_token()
-            assert mock_cred.get_token.call_count == 1
+        provider.get_token()
+        assert mock_cred.get_token.call_count == 1
 
         # Advance time past expiry buffer (expires_on - 300)
-        mock_cred.get_token.return_value = SimpleNamespace(
-            token="tok-2", expires_on=3000.0,
-        )
-        with patch("time.time", return_value=1750.0):
-            t2 = provider.get_token()
-            assert t2 == "tok-2"
-            assert mock_cred.get_token.call_count == 2
+        mock_cred.get_token.return_value = _token("tok-2", 3000.0)
+        clock.advance(750)
+        t2 = provider.get_token()
+        assert t2 == "tok-2"
+        assert mock_cred.get_token.call_count == 2
 
 
 class TestNoEndpointSkip:
@@ -108,63 +117,59 @@ class TestNoEndpointSkip:
         assert "skipped" in result.detail
 
 
-def _make_http_error(code: int, body: str = "") -> urllib.error.HTTPError:
-    """Build a synthetic HTTPError with a readable body."""
-    fp = BytesIO(body.encode())
-    return urllib.error.HTTPError(
-        url="https://x.cognitiveservices.azure.com",
-        code=code,
-        msg=f"HTTP {code}",
-        hdrs={},  # type: ignore[arg-type]
-        fp=fp,
-    )
+class _StubHTTPError(urllib.error.HTTPError):
+    """Minimal HTTPError carrying only ``code`` and a readable body.
+
+    Skips ``HTTPError.__init__`` so no file object or response wrapper is
+    built; the service only touches ``code`` and ``read()``.
+    """
+
+    def __init__(self, code: int, body: bytes = b"") -> None:
+        Exception.__init__(self, code)
+        self.code = code
+        self.msg = f"HTTP {code}"
+        self._body = body
+
+    def read(self, *_args: object) -> bytes:
+        return self._body
+
+
+_ERR_401 = _StubHTTPError(401, b"PermissionDenied")
+_ERR_403 = _StubHTTPError(403, b"Forbidden")
+_ERR_500 = _StubHTTPError(500, b"Internal Server Error")
 
 
 class TestApiCheckAuthErrors:
     """401/403 from the API must block, not silently pass."""
 
-    def test_401_blocks_instead_of_fallback(self) -> None:
+    @pytest.mark.parametrize(
+        "err",
+        [_ERR_401, _ERR_403, _ERR_500],
+        ids=["401", "403", "500"],
+    )
+    def test_http_error_blocks(self, err: _StubHTTPError) -> None:
+        """All HTTP errors block -- no silent fallback."""
         svc = PromptShieldService(endpoint="https://x.cognitiveservices.azure.com")
         svc._token_provider = MagicMock()
         svc._token_provider.get_token.return_value = "tok"
 
-        with patch(
-            "urllib.request.urlopen",
-            side_effect=_make_http_error(401, "PermissionDenied"),
-        ):
-            result = svc._api_check("Hello, what is the weather?")
+        with patch("urllib.request.urlopen", side_effect=err):
+            result = svc._api_check("What's the weather today?")
         assert result.attack_detected is True
         assert result.mode == "prompt_shields"
-        assert "401" in result.detail
+        assert str(err.code) in result.detail
 
-    def test_403_blocks_instead_of_fallback(self) -> None:
-        svc = PromptShieldService(endpoint="https://x.cognitiveservices.azure.com")
-        svc._token_provider = MagicMock()
-        svc._token_provider.get_token.return_value = "tok"
 
-        with patch(
-            "urllib.request.urlopen",
-            side_effect=_make_http_error(403, "Forbidden"),
-        ):
-            result = svc._api_check("What's the weather today?")
-        assert result.attack_detected is True
-        assert result.mode == "prompt_shields"
-        assert "403" in result.detail
+_DRY_RUN_OK_BODY = b'{"userPromptAnalysis": {"attackDetected": false}}'
 
-    def test_500_blocks_for_safety(self) -> None:
-        """All HTTP errors block -- no silent fallback."""
-        svc = PromptShieldService(endpoint="https://x.cognitiveservices.azure.com")
-        svc._token_provider = MagicMock()
-        svc._token_provider.get_token.return_value = "tok"
 
-        with patch(
-            "urllib.request.urlopen",
-            side_effect=_make_http_error(500, "Internal Server Error"),
-        ):
-            result = svc._api_check("What's the weather today?")
-        assert result.mode == "prompt_shields"
-        assert result.attack_detected is True
-        assert "500" in result.detail
+def _mock_resp(body: bytes) -> MagicMock:
+    """Context-manager response mock as returned by ``urlopen``."""
+    resp = MagicMock()
+    resp.read.return_value = body
+    resp.__enter__.return_value = resp
+    resp.__exit__.return_value = False
+    return resp
 
 
 class TestDryRun:
@@ -181,16 +186,7 @@ class TestDryRun:
         svc._token_provider = MagicMock()
         svc._token_provider.get_token.return_value = "tok"
 
-        resp_body = json.dumps({
-            "userPromptAnalysis": {"attackDetected": False},
-        }).encode()
-
-        mock_resp = MagicMock()
-        mock_resp.read.return_value = resp_body
-        mock_resp.__enter__ = MagicMock(return_value=mock_resp)
-        mock_resp.__exit__ = MagicMock(return_value=False)
-
-        with patch("urllib.request.urlopen", return_value=mock_resp):
+        with patch("urllib.request.urlopen", return_value=_mock_resp(_DRY_RUN_OK_BODY)):
             result = svc.dry_run()
         assert result.attack_detected is False
         assert "OK" in result.detail
@@ -202,7 +198,7 @@ class TestDryRun:
 
         with patch(
             "urllib.request.urlopen",
-            side_effect=_make_http_error(401, "PermissionDenied"),
+            side_effect=_ERR_401,
         ):
             result = svc.dry_run()
         assert result.attack_detected is True
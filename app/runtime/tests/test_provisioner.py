@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -10,11 +11,11 @@ from app.runtime.config.settings import cfg
 from app.runtime.services.deployment._models import StepTracker
 from app.runtime.services.deployment.provisioner import Provisioner
 from app.runtime.state.deploy_state import DeployStateStore
-from app.runtime.state.infra_config import InfraConfigStore
+from app.runtime.state.infra_config import InfraConfig, InfraConfigStore
 from app.runtime.util.result import Result
 
 
-@pytest.fixture()
+@pytest.fixture(scope="module")
 def az() -> MagicMock:
     mock = MagicMock()
     mock.ok.return_value = (True, "ok")
@@ -26,12 +27,12 @@ def az() -> MagicMock:
     return mock
 
 
-@pytest.fixture()
+@pytest.fixture(scope="module")
 def deployer() -> MagicMock:
     return MagicMock()
 
 
-@pytest.fixture()
+@pytest.fixture(scope="module")
 def tunnel() -> MagicMock:
     mock = MagicMock()
     mock.is_active = False
@@ -39,14 +40,32 @@ def tunnel() -> MagicMock:
     return mock
 
 
-@pytest.fixture()
-def store(data_dir) -> InfraConfigStore:
-    return InfraConfigStore()
+@pytest.fixture(scope="module")
+def _store_dir(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    return tmp_path_factory.mktemp("provisioner")
 
 
-@pytest.fixture()
-def deploy_store(data_dir) -> DeployStateStore:
-    return DeployStateStore()
+@pytest.fixture(scope="module")
+def store(_store_dir: Path) -> InfraConfigStore:
+    return InfraConfigStore(path=_store_dir / "infra.json")
+
+
+@pytest.fixture(scope="module")
+def deploy_store(_store_dir: Path) -> DeployStateStore:
+    return DeployStateStore(path=_store_dir / "deployments.json")
+
+
+@pytest.fixture(autouse=True)
+def _reset_shared(az, deployer, tunnel, store, deploy_store):
+    """Reset the module-scoped mocks and stores so every test starts clean."""
+    yield
+    az.reset_mock(side_effect=True)
+    deployer.reset_mock(return_value=True, side_effect=True)
+    tunnel.reset_mock(side_effect=True)
+    store._config = InfraConfig()
+    store.path.unlink(missing_ok=True)
+    for deploy_id in list(deploy_store.all_deployments):
+        deploy_store.remove(deploy_id)
 
 
 @pytest.fixture()
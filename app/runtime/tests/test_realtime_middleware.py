@@ -5,6 +5,7 @@ from __future__ import annotations
 from unittest.mock import MagicMock
 
 import pytest
+from azure.core.credentials import AzureKeyCredential
 
 from app.runtime.realtime.middleware import (
     RealtimeMiddleTier,
@@ -12,6 +13,7 @@ from app.runtime.realtime.middleware import (
     _acs_to_openai,
     _openai_to_acs,
 )
+from app.runtime.realtime.tools import ALL_REALTIME_TOOL_SCHEMAS
 
 
 class TestToolCall:
@@ -80,9 +82,27 @@ class TestOpenaiToAcs:
         assert result is None
 
 
+@pytest.fixture(scope="module")
+def mid() -> RealtimeMiddleTier:
+    return RealtimeMiddleTier(
+        "https://endpoint.com", "deploy1",
+        AzureKeyCredential("key"),
+    )
+
+
 class TestRealtimeMiddleTier:
+    @pytest.fixture(autouse=True)
+    def _reset_mid(self, mid: RealtimeMiddleTier):
+        """Restore the fields tests mutate on the shared middle tier."""
+        yield
+        mid._pending_prompt = None
+        mid._pending_opening_message = None
+        mid._pending_tools = None
+        mid._pending_exclusive = False
+        mid._key = "key"
+        mid._token_provider = None
+
     def test_init_with_key(self) -> None:
-        from azure.core.credentials import AzureKeyCredential
         mid = RealtimeMiddleTier(
             "https://endpoint.com", "deploy1",
             AzureKeyCredential("test-key"), voice="echo",
@@ -91,60 +111,33 @@ class TestRealtimeMiddleTier:
         assert mid.voice == "echo"
         assert mid._token_provider is None
 
-    def test_set_pending_prompt(self) -> None:
-        from azure.core.credentials import AzureKeyCredential
-        mid = RealtimeMiddleTier(
-            "https://endpoint.com", "deploy1",
-            AzureKeyCredential("key"),
-        )
+    def test_set_pending_prompt(self, mid: RealtimeMiddleTier) -> None:
         mid.set_pending_prompt("custom prompt", opening_message="Hello caller")
         assert mid._pending_prompt == "custom prompt"
         assert mid._pending_opening_message == "Hello caller"
         assert mid._pending_tools is None
         assert mid._pending_exclusive is False
 
-    def test_set_pending_prompt_exclusive_with_tools(self) -> None:
-        from azure.core.credentials import AzureKeyCredential
-        mid = RealtimeMiddleTier(
-            "https://endpoint.com", "deploy1",
-            AzureKeyCredential("key"),
-        )
+    def test_set_pending_prompt_exclusive_with_tools(self, mid: RealtimeMiddleTier) -> None:
         tools = [{"type": "function", "name": "accept"}]
         mid.set_pending_prompt("verify", tools=tools, exclusive=True)
         assert mid._pending_prompt == "verify"
         assert mid._pending_tools == tools
         assert mid._pending_exclusive is True
 
-    def test_consume_pending_no_pending(self) -> None:
-        from azure.core.credentials import AzureKeyCredential
-        from app.runtime.realtime.tools import ALL_REALTIME_TOOL_SCHEMAS
-        mid = RealtimeMiddleTier(
-            "https://endpoint.com", "deploy1",
-            AzureKeyCredential("key"),
-        )
+    def test_consume_pending_no_pending(self, mid: RealtimeMiddleTier) -> None:
         prompt, tools = mid._consume_pending()
         assert prompt == mid.system_message
         assert tools == ALL_REALTIME_TOOL_SCHEMAS
 
-    def test_consume_pending_with_prompt(self) -> None:
-        from azure.core.credentials import AzureKeyCredential
-        from app.runtime.realtime.tools import ALL_REALTIME_TOOL_SCHEMAS
-        mid = RealtimeMiddleTier(
-            "https://endpoint.com", "deploy1",
-            AzureKeyCredential("key"),
-        )
+    def test_consume_pending_with_prompt(self, mid: RealtimeMiddleTier) -> None:
         mid.set_pending_prompt("test prompt")
         prompt, tools = mid._consume_pending()
         assert mid.system_message in prompt
         assert mid._pending_prompt is None
         assert tools == ALL_REALTIME_TOOL_SCHEMAS
 
-    def test_consume_pending_exclusive_replaces_prompt(self) -> None:
-        from azure.core.credentials import AzureKeyCredential
-        mid = RealtimeMiddleTier(
-            "https://endpoint.com", "deploy1",
-            AzureKeyCredential("key"),
-        )
+    def test_consume_pending_exclusive_replaces_prompt(self, mid: RealtimeMiddleTier) -> None:
         custom_tools = [{"type": "function", "name": "accept"}]
         mid.set_pending_prompt("VERIFY ONLY", tools=custom_tools, exclusive=True)
         prompt, tools = mid._consume_pending()
@@ -157,12 +150,7 @@ class TestRealtimeMiddleTier:
         assert mid._pending_tools is None
         assert mid._pending_exclusive is False
 
-    def test_consume_pending_exclusive_with_opening_message(self) -> None:
-        from azure.core.credentials import AzureKeyCredential
-        mid = RealtimeMiddleTier(
-            "https://endpoint.com", "deploy1",
-            AzureKeyCredential("key"),
-        )
+    def test_consume_pending_exclusive_with_opening_message(self, mid: RealtimeMiddleTier) -> None:
         custom_tools = [{"type": "function", "name": "accept"}]
         mid.set_pending_prompt(
             "VERIFY ONLY",
@@ -178,21 +166,11 @@ class TestRealtimeMiddleTier:
         assert mid.system_message not in prompt
         assert tools == custom_tools
 
-    def test_auth_headers_with_key(self) -> None:
-        from azure.core.credentials import AzureKeyCredential
-        mid = RealtimeMiddleTier(
-            "https://endpoint.com", "deploy1",
-            AzureKeyCredential("mykey"),
-        )
+    def test_auth_headers_with_key(self, mid: RealtimeMiddleTier) -> None:
         headers = mid._auth_headers()
-        assert headers == {"api-key": "mykey"}
+        assert headers == {"api-key": "key"}
 
-    def test_auth_headers_no_auth_raises(self) -> None:
-        from azure.core.credentials import AzureKeyCredential
-        mid = RealtimeMiddleTier(
-            "https://endpoint.com", "deploy1",
-            AzureKeyCredential("key"),
-        )
+    def test_auth_headers_no_auth_raises(self, mid: RealtimeMiddleTier) -> None:
         mid._key = None
         mid._token_provider = None
         with pytest.raises(ValueError, match="No authentication"):
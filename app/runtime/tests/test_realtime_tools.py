@@ -9,6 +9,7 @@ from unittest.mock import AsyncMock, MagicMock, patch
 import pytest
 
 from app.runtime.realtime.tools import (
+    ALL_REALTIME_TOOL_NAMES,
     ALL_REALTIME_TOOL_SCHEMAS,
     TaskStatus,
     TaskStore,
@@ -73,10 +74,9 @@ class TestTaskStatus:
 class TestSchemas:
     def test_all_schemas_present(self) -> None:
         assert len(ALL_REALTIME_TOOL_SCHEMAS) == 3
-        names = {s["name"] for s in ALL_REALTIME_TOOL_SCHEMAS}
-        assert "invoke_agent" in names
-        assert "invoke_agent_async" in names
-        assert "check_agent_task" in names
+        assert ALL_REALTIME_TOOL_NAMES == frozenset({
+            "invoke_agent", "invoke_agent_async", "check_agent_task",
+        })
 
     def test_schema_structure(self) -> None:
         for schema in ALL_REALTIME_TOOL_SCHEMAS:
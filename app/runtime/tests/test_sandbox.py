@@ -64,6 +64,9 @@ class TestParseToolArgs:
     def test_json_list(self) -> None:
         assert _parse_tool_args("[1, 2]") == {}
 
+    def test_json_string_leading_whitespace(self) -> None:
+        assert _parse_tool_args('\n  {"cmd": "ls"}') == {"cmd": "ls"}
+
 
 class TestExtractCommand:
     def test_from_dict_command(self) -> None:
@@ -206,7 +209,7 @@ class TestSandboxExecutor:
         import time
         store = SandboxConfigStore()
         executor = SandboxExecutor(config_store=store)
-        start = time.time()
+        start = time.monotonic_ns()
         result = executor._timing(start, "test-id")
         assert "duration_ms" in result
         assert result["session_id"] == "test-id"
@@ -216,7 +219,7 @@ class TestSandboxExecutor:
         import time
         store = SandboxConfigStore()
         executor = SandboxExecutor(config_store=store)
-        start = time.time()
+        start = time.monotonic_ns()
         result = executor._result(False, "fail reason", start, "s1")
         assert result["success"] is False
         assert result["error"] == "fail reason"
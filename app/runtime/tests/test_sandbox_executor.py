@@ -5,6 +5,7 @@ from __future__ import annotations
 import io
 import json
 import os
+import shlex
 import zipfile
 from pathlib import Path
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -90,6 +91,9 @@ class TestExtractCommand:
     def test_priority(self) -> None:
         assert _extract_command({"command": "first", "cmd": "second"}) == "first"
 
+    def test_skips_empty_values(self) -> None:
+        assert _extract_command({"command": "", "cmd": None, "script": "ls"}) == "ls"
+
 
 class TestBuildReplayCommand:
     def test_stdout_only(self) -> None:
@@ -113,6 +117,11 @@ class TestBuildReplayCommand:
         assert "printf" in cmd
         assert "exit 1" not in cmd
 
+    def test_quotes_round_trip(self) -> None:
+        stdout = "it's a \"test\" $HOME `x`\n"
+        cmd = _build_replay_command(stdout, "", True)
+        assert shlex.split(cmd) == ["printf", "%s", stdout]
+
 
 class TestSandboxExecutor:
     def test_enabled_delegates_to_store(self) -> None:
@@ -202,6 +211,20 @@ class TestSandboxExecutor:
         assert (tmp_path / "allowed" / "data.txt").read_text() == "result data"
         assert not (tmp_path / "disallowed").exists()
 
+    def test_merge_result_zip_from_path(self, tmp_path: Path) -> None:
+        archive = tmp_path / "agent_result.zip"
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("allowed/data.txt", "result data")
+        store = MagicMock()
+        store.whitelist = ["allowed"]
+        executor = SandboxExecutor(config_store=store)
+        data_dir = tmp_path / "data"
+        with patch("app.runtime.sandbox.executor.cfg") as mock_cfg:
+            mock_cfg.data_dir = data_dir
+            count = executor._merge_result_zip(archive)
+        assert count == 1
+        assert (data_dir / "allowed" / "data.txt").read_text() == "result data"
+
     def test_merge_result_zip_blocks_path_traversal(self, tmp_path: Path) -> None:
         buf = io.BytesIO()
         with zipfile.ZipFile(buf, "w") as zf:
@@ -215,13 +238,94 @@ class TestSandboxExecutor:
             count = executor._merge_result_zip(buf.getvalue())
         assert count == 0
 
+    def test_merge_result_zip_normalises_member_names(self, tmp_path: Path) -> None:
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as zf:
+            zf.writestr("allowed/./tmp/../data.txt", "ok")
+            zf.writestr("allowed/../../escape.txt", "bad")
+            zf.writestr("allowed/../other/file.txt", "bad")
+        store = MagicMock()
+        store.whitelist = ["allowed"]
+        executor = SandboxExecutor(config_store=store)
+        data_dir = tmp_path / "data"
+        with patch("app.runtime.sandbox.executor.cfg") as mock_cfg:
+            mock_cfg.data_dir = data_dir
+            count = executor._merge_result_zip(buf.getvalue())
+        assert count == 1
+        assert (data_dir / "allowed" / "data.txt").read_text() == "ok"
+        assert not (tmp_path / "escape.txt").exists()
+        assert not (data_dir / "other").exists()
+
+    def test_create_data_zip_nested_dirs(self, tmp_path: Path) -> None:
+        nested = tmp_path / "subdir" / "nested"
+        nested.mkdir(parents=True)
+        (tmp_path / "subdir" / "a.txt").write_text("a")
+        (nested / "b.txt").write_text("b")
+        (tmp_path / "subdir" / "link").symlink_to(nested, target_is_directory=True)
+        store = MagicMock()
+        store.whitelist = ["subdir"]
+        executor = SandboxExecutor(config_store=store)
+        with patch("app.runtime.sandbox.executor.cfg") as mock_cfg:
+            mock_cfg.data_dir = tmp_path
+            result = executor._create_data_zip()
+        assert result is not None
+        with zipfile.ZipFile(io.BytesIO(result), "r") as zf:
+            assert sorted(zf.namelist()) == ["subdir/a.txt", "subdir/nested/b.txt"]
+
+    def test_create_data_zip_skips_unlistable_dir(self, tmp_path: Path) -> None:
+        (tmp_path / "subdir" / "locked").mkdir(parents=True)
+        (tmp_path / "subdir" / "a.txt").write_text("a")
+        (tmp_path / "subdir" / "locked" / "b.txt").write_text("b")
+        real_scandir = os.scandir
+
+        def scandir(path):
+            if os.path.basename(path) == "locked":
+                raise PermissionError(path)
+            return real_scandir(path)
+
+        store = MagicMock()
+        store.whitelist = ["subdir"]
+        executor = SandboxExecutor(config_store=store)
+        with (
+            patch("app.runtime.sandbox.executor.cfg") as mock_cfg,
+            patch("app.runtime.sandbox.executor.os.scandir", side_effect=scandir),
+        ):
+            mock_cfg.data_dir = tmp_path
+            result = executor._create_data_zip()
+        assert result is not None
+        with zipfile.ZipFile(io.BytesIO(result), "r") as zf:
+            assert zf.namelist() == ["subdir/a.txt"]
+
+    def test_create_data_zip_stores_small_and_compressed_entries(self, tmp_path: Path) -> None:
+        sub = tmp_path / "media"
+        sub.mkdir()
+        (sub / "small.txt").write_text("tiny")
+        (sub / "big.txt").write_text("x" * 10_000)
+        (sub / "photo.PNG").write_bytes(os.urandom(10_000))
+        store = MagicMock()
+        store.whitelist = ["media"]
+        executor = SandboxExecutor(config_store=store)
+        with patch("app.runtime.sandbox.executor.cfg") as mock_cfg:
+            mock_cfg.data_dir = tmp_path
+            result = executor._create_data_zip()
+        assert result is not None
+        with zipfile.ZipFile(io.BytesIO(result), "r") as zf:
+            methods = {i.filename: i.compress_type for i in zf.infolist()}
+            assert zf.read("media/big.txt") == b"x" * 10_000
+        assert methods == {
+            "media/small.txt": zipfile.ZIP_STORED,
+            "media/big.txt": zipfile.ZIP_DEFLATED,
+            "media/photo.PNG": zipfile.ZIP_STORED,
+        }
+
     def test_timing(self) -> None:
         store = MagicMock()
         executor = SandboxExecutor(config_store=store)
         import time
-        start = time.time()
+        start = time.monotonic_ns()
         t = executor._timing(start, "sess-1")
         assert "duration_ms" in t
+        assert isinstance(t["duration_ms"], int) and t["duration_ms"] >= 0
         assert "session_id" in t
         assert t["session_id"] == "sess-1"
 
@@ -229,7 +333,7 @@ class TestSandboxExecutor:
         store = MagicMock()
         executor = SandboxExecutor(config_store=store)
         import time
-        start = time.time()
+        start = time.monotonic_ns()
         r = executor._result(False, "oops", start, "sess-2")
         assert r["success"] is False
         assert r["error"] == "oops"
@@ -252,6 +356,47 @@ class TestSandboxExecutor:
         assert count == 0
         assert executor._pending_data_zip is None
 
+    @pytest.mark.asyncio
+    async def test_build_archives_returns_code_zip_error(self) -> None:
+        store = MagicMock()
+        store.sync_data = True
+        executor = SandboxExecutor(config_store=store)
+        with (
+            patch.object(executor, "_create_data_zip", return_value=b"data"),
+            patch.object(executor, "_create_code_zip", side_effect=OSError("disk")),
+        ):
+            data_zip, code_zip = await executor._build_archives()
+        assert data_zip == b"data"
+        assert isinstance(code_zip, OSError)
+
+    @pytest.mark.asyncio
+    async def test_download_file_writes_off_loop(self, tmp_path: Path) -> None:
+        async def chunks(_size: int):
+            for chunk in (b"PK", b"\x03\x04", b"rest"):
+                yield chunk
+
+        resp = MagicMock()
+        resp.status = 200
+        resp.content.iter_chunked = chunks
+        http = MagicMock()
+        http.get.return_value.__aenter__ = AsyncMock(return_value=resp)
+        http.get.return_value.__aexit__ = AsyncMock(return_value=False)
+        executor = SandboxExecutor(config_store=MagicMock())
+        dest = tmp_path / "agent_result.zip"
+        calls: list[str] = []
+
+        async def fake_run_sync(fn, *args):
+            calls.append(getattr(fn, "__name__", repr(fn)))
+            return fn(*args)
+
+        with patch("app.runtime.sandbox.executor.run_sync", side_effect=fake_run_sync):
+            ok = await executor._download_file(
+                http, "https://pool", "sess", "agent_result.zip", {}, dest,
+            )
+        assert ok is True
+        assert dest.read_bytes() == b"PK\x03\x04rest"
+        assert calls == ["open", "write", "write", "write", "close"]
+
     @pytest.mark.asyncio
     async def test_execute_no_endpoint(self) -> None:
         store = MagicMock()
@@ -276,6 +421,10 @@ class TestSandboxToolInterceptor:
         interceptor.touch()
         assert interceptor._last_activity > 0
 
+    def test_has_no_instance_dict(self) -> None:
+        interceptor = SandboxToolInterceptor(MagicMock())
+        assert not hasattr(interceptor, "__dict__")
+
     @pytest.mark.asyncio
     async def test_on_pre_tool_use_disabled(self) -> None:
         executor = MagicMock()
@@ -340,21 +489,40 @@ class TestSandboxToolInterceptor:
         assert "(no output)" in result["modifiedResult"]
 
 
+def _upload_resp(status: int, text: str = "") -> AsyncMock:
+    resp = AsyncMock()
+    resp.status = status
+    resp.text = AsyncMock(return_value=text)
+    resp.__aenter__ = AsyncMock(return_value=resp)
+    resp.__aexit__ = AsyncMock(return_value=False)
+    return resp
+
+
+@pytest.fixture(scope="module")
+def http_factory():
+    """Build ClientSession mocks whose ``post`` yields the given responses.
+
+    The spec is resolved once per module: introspecting ClientSession's
+    attribute surface is the expensive part of ``MagicMock(spec=...)``.
+    """
+    spec = dir(aiohttp.ClientSession)
+
+    def _mk(side_effect=None, return_value=None) -> MagicMock:
+        http = MagicMock(spec=spec)
+        http.post = MagicMock(side_effect=side_effect, return_value=return_value)
+        return http
+
+    return _mk
+
+
 class TestUploadBytesRetry:
     """Tests for _upload_bytes retry logic with exponential backoff."""
 
     @pytest.mark.asyncio
     @patch("app.runtime.sandbox.executor._UPLOAD_BACKOFF_BASE", 0.0)
-    async def test_upload_succeeds_on_first_attempt(self) -> None:
-        store = MagicMock()
-        executor = SandboxExecutor(config_store=store)
-        mock_resp = AsyncMock()
-        mock_resp.status = 200
-        mock_resp.__aenter__ = AsyncMock(return_value=mock_resp)
-        mock_resp.__aexit__ = AsyncMock(return_value=False)
-
-        http = MagicMock(spec=aiohttp.ClientSession)
-        http.post = MagicMock(return_value=mock_resp)
+    async def test_upload_succeeds_on_first_attempt(self, http_factory) -> None:
+        executor = SandboxExecutor(config_store=MagicMock())
+        http = http_factory(return_value=_upload_resp(200))
 
         result = await executor._upload_bytes(
             http, "https://endpoint", "sess-1", "file.zip", b"data", {},
@@ -364,23 +532,11 @@ class TestUploadBytesRetry:
 
     @pytest.mark.asyncio
     @patch("app.runtime.sandbox.executor._UPLOAD_BACKOFF_BASE", 0.0)
-    async def test_upload_retries_on_http_error_then_succeeds(self) -> None:
-        store = MagicMock()
-        executor = SandboxExecutor(config_store=store)
-
-        fail_resp = AsyncMock()
-        fail_resp.status = 500
-        fail_resp.text = AsyncMock(return_value="Internal Server Error")
-        fail_resp.__aenter__ = AsyncMock(return_value=fail_resp)
-        fail_resp.__aexit__ = AsyncMock(return_value=False)
-
-        ok_resp = AsyncMock()
-        ok_resp.status = 200
-        ok_resp.__aenter__ = AsyncMock(return_value=ok_resp)
-        ok_resp.__aexit__ = AsyncMock(return_value=False)
-
-        http = MagicMock(spec=aiohttp.ClientSession)
-        http.post = MagicMock(side_effect=[fail_resp, ok_resp])
+    async def test_upload_retries_on_http_error_then_succeeds(self, http_factory) -> None:
+        executor = SandboxExecutor(config_store=MagicMock())
+        http = http_factory(
+            side_effect=[_upload_resp(500, "Internal Server Error"), _upload_resp(200)],
+        )
 
         result = await executor._upload_bytes(
             http, "https://endpoint", "sess-1", "file.zip", b"data", {},
@@ -390,18 +546,10 @@ class TestUploadBytesRetry:
 
     @pytest.mark.asyncio
     @patch("app.runtime.sandbox.executor._UPLOAD_BACKOFF_BASE", 0.0)
-    async def test_upload_retries_on_exception_then_succeeds(self) -> None:
-        store = MagicMock()
-        executor = SandboxExecutor(config_store=store)
-
-        ok_resp = AsyncMock()
-        ok_resp.status = 201
-        ok_resp.__aenter__ = AsyncMock(return_value=ok_resp)
-        ok_resp.__aexit__ = AsyncMock(return_value=False)
-
-        http = MagicMock(spec=aiohttp.ClientSession)
-        http.post = MagicMock(
-            side_effect=[aiohttp.ClientError("connection reset"), ok_resp],
+    async def test_upload_retries_on_exception_then_succeeds(self, http_factory) -> None:
+        executor = SandboxExecutor(config_store=MagicMock())
+        http = http_factory(
+            side_effect=[aiohttp.ClientError("connection reset"), _upload_resp(201)],
         )
 
         result = await executor._upload_bytes(
@@ -412,18 +560,9 @@ class TestUploadBytesRetry:
 
     @pytest.mark.asyncio
     @patch("app.runtime.sandbox.executor._UPLOAD_BACKOFF_BASE", 0.0)
-    async def test_upload_fails_after_all_retries(self) -> None:
-        store = MagicMock()
-        executor = SandboxExecutor(config_store=store)
-
-        fail_resp = AsyncMock()
-        fail_resp.status = 503
-        fail_resp.text = AsyncMock(return_value="Service Unavailable")
-        fail_resp.__aenter__ = AsyncMock(return_value=fail_resp)
-        fail_resp.__aexit__ = AsyncMock(return_value=False)
-
-        http = MagicMock(spec=aiohttp.ClientSession)
-        http.post = MagicMock(return_value=fail_resp)
+    async def test_upload_fails_after_all_retries(self, http_factory) -> None:
+        executor = SandboxExecutor(config_store=MagicMock())
+        http = http_factory(return_value=_upload_resp(503, "Service Unavailable"))
 
         result = await executor._upload_bytes(
             http, "https://endpoint", "sess-1", "file.zip", b"data", {},
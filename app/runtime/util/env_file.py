@@ -3,8 +3,30 @@
 from __future__ import annotations
 
 import threading
+import time
 from pathlib import Path
 
+# A parse is only reused when the file's mtime is older than this, so a
+# rewrite within one filesystem timestamp tick can never hide behind an
+# unchanged (mtime, size) pair -- the same "racily clean" rule git uses.
+_RACY_WINDOW_NS = 2_000_000_000
+
+
+def _parse(text: str) -> dict[str, str]:
+    """Parse ``KEY=VALUE`` lines, skipping blanks, comments and lines without ``=``."""
+    result: dict[str, str] = {}
+    for line in text.splitlines():
+        # Partition first: blank lines have no separator, and a stripped
+        # line starts with "#" exactly when its stripped key does.
+        key, sep, value = line.partition("=")
+        if not sep:
+            continue
+        key = key.strip()
+        if key.startswith("#"):
+            continue
+        result[key] = value.strip().strip('"').strip("'")
+    return result
+
 
 class EnvFile:
     """Reads and writes a simple ``KEY=VALUE`` file with thread safety."""
@@ -12,35 +34,52 @@ class EnvFile:
     def __init__(self, path: str | Path) -> None:
         self.path = Path(path)
         self._lock = threading.Lock()
+        self._cache: tuple[tuple[int, int], dict[str, str]] | None = None
 
     def read(self, key: str) -> str:
         """Return the value for *key*, or ``""`` if absent."""
-        return self.read_all().get(key, "")
+        return self._parsed().get(key, "")
 
     def read_all(self) -> dict[str, str]:
         """Parse the env file into a ``{key: value}`` mapping."""
-        if not self.path.exists():
+        return dict(self._parsed())
+
+    def _parsed(self) -> dict[str, str]:
+        """Return the parsed file, reusing the last parse while it is unchanged."""
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
             return {}
-        result: dict[str, str] = {}
-        for line in self.path.read_text().splitlines():
-            line = line.strip()
-            if not line or line.startswith("#") or "=" not in line:
-                continue
-            key, _, value = line.partition("=")
-            result[key.strip()] = value.strip().strip('"').strip("'")
+        stamp = (st.st_mtime_ns, st.st_size)
+        cache = self._cache
+        if cache is not None and cache[0] == stamp:
+            return cache[1]
+        result = _parse(self.path.read_text())
+        if time.time_ns() - st.st_mtime_ns > _RACY_WINDOW_NS:
+            self._cache = (stamp, result)
         return result
 
     def write(self, **kwargs: str) -> None:
         """Merge *kwargs* into the env file, preserving existing entries.
 
         Values are wrapped in double-quotes so that ``bash source`` handles
-        special characters (``~``, ``!``, ``$``, spaces, etc.) safely.
+        special characters (``~``, ``!``, ``$``, spaces, etc.) safely.  The
+        file is left untouched when the merge would not change its contents,
+        which keeps its mtime -- and every reader's cached parse -- valid.
         """
         with self._lock:
-            existing = self.read_all()
+            try:
+                current = self.path.read_text()
+            except FileNotFoundError:
+                current = None
+            existing = _parse(current) if current is not None else {}
             existing.update(kwargs)
             lines = [
                 f'{k}="{v}"' for k, v in sorted(existing.items()) if v
             ]
+            text = "\n".join(lines) + "\n"
+            if text == current:
+                return
             self.path.parent.mkdir(parents=True, exist_ok=True)
-            self.path.write_text("\n".join(lines) + "\n")
+            self.path.write_text(text)
+            self._cache = None
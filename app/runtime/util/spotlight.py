@@ -2,8 +2,6 @@
 
 from __future__ import annotations
 
-import re
-
 _DEFAULT_MARKER = "^"
 
 
@@ -15,7 +13,9 @@ def datamark(text: str, marker: str = _DEFAULT_MARKER) -> str:
     >>> datamark("  a  b  ")
     'a^b'
     """
-    return re.sub(r"\s+", marker, text.strip())
+    # str.split() uses the same Unicode whitespace set as ``\s`` and
+    # collapses runs (and trims the ends) in a single C-level pass.
+    return marker.join(text.split())
 
 
 def delimit(text: str, tag: str = "UNTRUSTED_CONTENT") -> str: